@@ -1,3 +1,5 @@
+# coding=utf-8
+import time
 from itertools import chain
 
 
@@ -58,6 +60,40 @@ class Passenger(object):
         return self.elevator is not None
 
 
+class Budget(object):
+    def __init__(self):
+        # Номер тика и остаток времени по часам сервера (None, если сервер их не прислал).
+        # В остаток не входит время, которое сообщение шло по сети
+        self.tick = None
+        self.time_left = None
+        self.tick_timeout = None
+        self.started = time.time()
+        # Сколько занял прошлый тик и все тики игры, по часам клиента
+        self.last_tick_time = 0.
+        self.total_time = 0.
+
+    def begin(self, state):
+        self.tick = state.get('tick')
+        self.time_left = state.get('time_left')
+        self.tick_timeout = state.get('tick_timeout')
+        self.started = time.time()
+
+    def end(self):
+        self.last_tick_time = time.time() - self.started
+        self.total_time += self.last_tick_time
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def remaining(self):
+        # Сколько еще можно считать на этом тике: меньший из лимитов сервера
+        # за вычетом уже потраченного, None, если лимиты неизвестны
+        limits = [t for t in (self.tick_timeout, self.time_left) if t is not None]
+        if not limits:
+            return None
+        return min(limits) - self.elapsed()
+
+
 class Debug(object):
     def __init__(self):
         self._messages = []
@@ -92,6 +128,7 @@ class Debug(object):
 class API(object):
     def __init__(self, type):
         self.debug = Debug()
+        self.budget = Budget()
         self.strategy = None
         self.color = type
         try:
@@ -113,12 +150,15 @@ class API(object):
         return my_elevators, my_passengers, enemy_elevators, enemy_passengers
 
     def turn(self, state):
+        self.budget.begin(state)
         my_elevators, my_passengers, enemy_elevators, enemy_passengers = self.parse_state(state)
         try:
             if self.strategy:
+                self.strategy.budget = self.budget
                 self.strategy.on_tick(my_elevators, my_passengers, enemy_elevators, enemy_passengers)
         except Exception as e:
             self.debug.exception(repr(e))
 
         result = list(chain(*[obj.messages for obj in my_elevators + my_passengers + enemy_passengers + [self.debug]]))
+        self.budget.end()
         return result
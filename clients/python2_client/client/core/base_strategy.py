@@ -1,4 +1,9 @@
+# coding=utf-8
 class BaseStrategy(object):
+    # core.api.Budget: номер тика, остаток времени и время прошлых тиков,
+    # API обновляет его перед каждым on_tick
+    budget = None
+
     def __init__(self, debug, type):
         self.debug = debug.log
         self.type = type
@@ -0,0 +1,42 @@
+# coding=utf-8
+import struct
+
+# Кадр бинарного протокола: длина тела (4 байта, big-endian) и само тело
+HEADER = struct.Struct('>I')
+
+
+class MsgpackFraming(object):
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.module = msgpack
+        # str и unicode python2 пакуются как строки msgpack и на любой стороне
+        # читаются как unicode, так же как после json.loads
+        self.packer = msgpack.Packer(use_bin_type=False)
+        self.unpack_options = {'raw': False}
+        if msgpack.version >= (1, 0):
+            self.unpack_options['strict_map_key'] = False
+
+    def dump(self, message):
+        body = self.packer.pack(message)
+        return HEADER.pack(len(body)) + body
+
+    def load(self, body):
+        return self.module.unpackb(body, **self.unpack_options)
+
+
+FRAMINGS = {
+    'msgpack': MsgpackFraming,
+}
+
+
+def create_framing(name):
+    # None, если формат неизвестен или его библиотека не установлена
+    framing_class = FRAMINGS.get(name)
+    if framing_class is None:
+        return None
+    try:
+        return framing_class()
+    except ImportError:
+        return None
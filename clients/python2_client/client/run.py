@@ -1,4 +1,3 @@
-import json
 import os
 from random import randint
 
@@ -9,29 +8,55 @@ from tornado.iostream import StreamClosedError
 from tornado.tcpclient import TCPClient
 
 from core.api import API
+from core.codec import codec
+from core.delta import DeltaDecoder
+from core.framing import HEADER, create_framing
 
 host = os.environ.get('WORLD_NAME', '127.0.0.1')
 port = 8000
+protocol = os.environ.get('PROTOCOL')
+message_format = os.environ.get('MESSAGE_FORMAT')
 
 
 class Client(object):
-    def __init__(self, solution_id):
+    def __init__(self, solution_id, protocol=None, message_format=None):
         self.solution_id = solution_id
+        self.protocol = protocol
+        self.format = message_format if create_framing(message_format) else None
+        self.decoder = None
+        self.framing = None
         self.color = None
 
-    @staticmethod
-    def dump_message(message):
-        message = '{}\n'.format(json.dumps(message).encode('string-escape'))
-        return message
+    def dump_message(self, message):
+        if self.framing:
+            return self.framing.dump(message)
+        return '{}\n'.format(codec.dumps(message))
+
+    @tornado.gen.coroutine
+    def read_message(self):
+        if self.framing:
+            header = yield self.stream.read_bytes(HEADER.size)
+            body = yield self.stream.read_bytes(HEADER.unpack(header)[0])
+            raise tornado.gen.Return(self.framing.load(body))
+        data = yield self.stream.read_until('\n')
+        raise tornado.gen.Return(codec.loads(data))
 
     @tornado.gen.coroutine
     def connect(self, host, port):
         self.stream = yield TCPClient().connect(host, port)
         self.stream.set_close_callback(self.on_close)
-        self.send_message({'solution_id': self.solution_id})
+        handshake = {'solution_id': self.solution_id}
+        if self.protocol:
+            handshake['protocol'] = self.protocol
+        if self.format:
+            handshake['format'] = self.format
+        self.send_message(handshake)
         try:
-            data = yield self.stream.read_until('\n')
-            data = json.loads(data)
+            data = yield self.read_message()
+            if data.get('protocol') == 'delta':
+                self.decoder = DeltaDecoder()
+            if data.get('format'):
+                self.framing = create_framing(data['format'])
             if data['message'] == 'beginning':
                 self.strategy_loop(data['color'])
             else:
@@ -49,10 +74,11 @@ class Client(object):
         api = API(color)
         while True:
             try:
-                data = yield self.stream.read_until('\n')
-                data = json.loads(data)
+                data = yield self.read_message()
                 if data.get('message') == 'down':
                     break
+                if self.decoder:
+                    data = self.decoder.decode(data)
                 turn = api.turn(data)
                 yield self.stream.write(self.dump_message(turn))
             except StreamClosedError:
@@ -64,5 +90,5 @@ class Client(object):
 
 
 solution_id = os.environ.get('SOLUTION_ID', randint(0, 1000))
-c = Client(solution_id).connect(host, port)
+c = Client(solution_id, protocol, message_format).connect(host, port)
 IOLoop.instance().start()
@@ -1,5 +1,13 @@
+from time import perf_counter
+
+
 # (Лифт) атрибуты только для чтения
 class Elevator:
+    # __dict__ в слотах оставлен для стратегий, которые вешают на объекты
+    # свои атрибуты: словарь заводится, только когда это происходит
+    __slots__ = ('add_action', 'id', 'y', 'passengers', 'state', 'speed', 'time_on_floor', 'next_floor',
+                 'messages', 'type', 'floor', '__dict__')
+
     def __init__(self, add_action, id: int, y: int, passengers: list, state: int, speed: float,
                  floor: int, next_floor: int, time_on_floor: int, type: str):
         self.add_action = add_action
@@ -14,6 +22,16 @@ class Elevator:
         self.type = type
         self.floor = floor
 
+    def update(self, data: dict, passengers: dict):
+        self.id = data['id']
+        self.y = data['y']
+        self.passengers = [passengers.get(p['id']) or Passenger(self.add_action, **p) for p in data['passengers']]
+        self.state = data['state']
+        self.speed = data['speed']
+        self.time_on_floor = data['time_on_floor']
+        self.next_floor = data['next_floor']
+        self.type = data['type']
+        self.floor = data['floor']
 
     def go_to_floor(self, floor):
         # todo: deny to enemy lift here (on server denied)
@@ -25,6 +43,9 @@ class Elevator:
 
 # (Пассажир) атрибуты только для чтения
 class Passenger:
+    __slots__ = ('add_action', 'id', 'elevator', 'from_floor', 'dest_floor', 'time_to_away', 'state', 'messages',
+                 'x', 'y', 'type', 'floor', 'weight', '__dict__')
+
     def __init__(self, add_action, id: int, elevator, x: float, y: float, state: int, time_to_away: int, from_floor: int, dest_floor: int, type: str, floor: float, weight: float):
         self.add_action = add_action
         self.id = id
@@ -40,6 +61,19 @@ class Passenger:
         self.floor = floor
         self.weight = weight
 
+    def update(self, data: dict):
+        self.id = data['id']
+        self.elevator = data['elevator']
+        self.from_floor = data['from_floor']
+        self.dest_floor = data['dest_floor']
+        self.time_to_away = data['time_to_away']
+        self.state = data['state']
+        self.x = data['x']
+        self.y = data['y']
+        self.type = data['type']
+        self.floor = data['floor']
+        self.weight = data['weight']
+
     # проверить, назначен ли лифт
     def has_elevator(self):
         return self.elevator is not None
@@ -49,7 +83,47 @@ class Passenger:
         self.add_action('set_elevator_to_passenger', {'passenger_id': self.id, 'elevator_id': elevator.id})
 
 
+# (Время стратегии) атрибуты только для чтения
+class Budget:
+    __slots__ = ('tick', 'time_left', 'tick_timeout', 'started', 'last_tick_time', 'total_time')
+
+    def __init__(self):
+        # Номер тика и остаток времени по часам сервера (None, если сервер их не прислал).
+        # В остаток не входит время, которое сообщение шло по сети
+        self.tick = None
+        self.time_left = None
+        self.tick_timeout = None
+        self.started = perf_counter()
+        # Сколько занял прошлый тик и все тики игры, по часам клиента
+        self.last_tick_time = 0.
+        self.total_time = 0.
+
+    def begin(self, state: dict):
+        self.tick = state.get('tick')
+        self.time_left = state.get('time_left')
+        self.tick_timeout = state.get('tick_timeout')
+        self.started = perf_counter()
+
+    def end(self):
+        self.last_tick_time = perf_counter() - self.started
+        self.total_time += self.last_tick_time
+
+    # сколько секунд прошло с получения состояния
+    def elapsed(self):
+        return perf_counter() - self.started
+
+    # сколько еще можно считать на этом тике: меньший из лимитов сервера за вычетом
+    # уже потраченного, None, если лимиты неизвестны
+    def remaining(self):
+        limits = [t for t in (self.tick_timeout, self.time_left) if t is not None]
+        if not limits:
+            return None
+        return min(limits) - self.elapsed()
+
+
 class Debug:
+    __slots__ = ('add_action',)
+
     def __init__(self, add_action):
         self.add_action = add_action
 
@@ -61,7 +135,19 @@ class Debug:
 
 
 class API:
-    def __init__(self):
+    def __init__(self, keep_strategy=False, pool_objects=False):
+        self.keep_strategy = keep_strategy
+        self.pool_objects = pool_objects
+        self.strategy = None
+        self.instance_exception = None
+        self.actions = []
+        self.elevators = {}
+        self.passengers = {}
+        self.debug = Debug(self.add_action)
+        self.budget = Budget()
+        self.create_strategy()
+
+    def create_strategy(self):
         try:
             from core.strategy import Strategy
             self.strategy = Strategy()
@@ -69,9 +155,28 @@ class API:
             self.strategy = None
             self.instance_exception = e
 
-    def generate_actions(self, state):
-        actions = []
-        add_action = lambda action, args: actions.append({'command': action, 'args': args})
+    def new_game(self):
+        # Модуль стратегии уже импортирован, заново создается только объект.
+        # С keep_strategy объект остается прежним, и его состояние сбрасывает reset()
+        self.elevators = {}
+        self.passengers = {}
+        self.budget = Budget()
+        if self.keep_strategy and self.strategy:
+            try:
+                self.strategy.reset()
+            except Exception:
+                self.create_strategy()
+        else:
+            self.create_strategy()
+
+    def add_action(self, action, args):
+        self.actions.append({'command': action, 'args': args})
+
+    @staticmethod
+    def dummy_action(action, args):
+        return action
+
+    def create_objects(self, state, add_action):
         dummy_action = lambda action, args: action
 
         my_passengers = state['my_passengers']
@@ -82,16 +187,64 @@ class API:
         enemy_elevators = [Elevator(dummy_action, **e) for e in enemy_elevators]
         my_passengers = [Passenger(add_action, **p) for p in my_passengers]
         enemy_passengers = [Passenger(add_action, **p) for p in enemy_passengers]
+        return my_elevators, my_passengers, enemy_elevators, enemy_passengers
+
+    def update_objects(self, state):
+        # Объекты живут между тиками в словарях по id и обновляются на месте.
+        # Пассажиры в лифтах - те же объекты, что и в списках пассажиров
+        passengers = {}
+        my_passengers = [self.pooled_passenger(p, passengers) for p in state['my_passengers']]
+        enemy_passengers = [self.pooled_passenger(p, passengers) for p in state['enemy_passengers']]
+        self.passengers = passengers
+
+        elevators = {}
+        my_elevators = [self.pooled_elevator(e, elevators, self.add_action) for e in state['my_elevators']]
+        enemy_elevators = [self.pooled_elevator(e, elevators, self.dummy_action) for e in state['enemy_elevators']]
+        self.elevators = elevators
+        return my_elevators, my_passengers, enemy_elevators, enemy_passengers
+
+    def pooled_passenger(self, data, passengers):
+        passenger = self.passengers.get(data['id'])
+        if passenger is None:
+            passenger = Passenger.__new__(Passenger)
+            passenger.add_action = self.add_action
+            passenger.messages = []
+        passenger.update(data)
+        passengers[passenger.id] = passenger
+        return passenger
+
+    def pooled_elevator(self, data, elevators, add_action):
+        elevator = self.elevators.get(data['id'])
+        if elevator is None:
+            elevator = Elevator.__new__(Elevator)
+            elevator.add_action = add_action
+            elevator.messages = []
+        elevator.update(data, self.passengers)
+        elevators[elevator.id] = elevator
+        return elevator
+
+    def generate_actions(self, state):
+        self.budget.begin(state)
+        if self.pool_objects:
+            actions = self.actions = []
+            objects = self.update_objects(state)
+            debug = self.debug
+        else:
+            actions = []
+            add_action = lambda action, args: actions.append({'command': action, 'args': args})
+            objects = self.create_objects(state, add_action)
+            debug = Debug(add_action)
 
-        debug = Debug(add_action)
         try:
             if self.strategy:
                 self.strategy.set_debug(debug)
-                self.strategy.on_tick(my_elevators, my_passengers, enemy_elevators, enemy_passengers)
+                self.strategy.budget = self.budget
+                self.strategy.on_tick(*objects)
             else:
                 if self.instance_exception:
                     debug.exception(self.instance_exception)
                     self.instance_exception = None
         except Exception as e:
             debug.exception(e)
+        self.budget.end()
         return actions
@@ -1,8 +1,15 @@
 class BaseStrategy(object):
     debug = None
+    # core.api.Budget: номер тика, остаток времени и время прошлых тиков,
+    # API обновляет его перед каждым on_tick
+    budget = None
 
     def set_debug(self, debug):
         self.debug = debug.log
 
     def on_tick(self, passengers, elevators):
         pass
+
+    def reset(self):
+        # Вызывается перед следующей игрой, если клиент запущен с KEEP_STRATEGY=1
+        pass
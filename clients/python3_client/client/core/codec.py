@@ -0,0 +1,100 @@
+import json
+import os
+
+# Сообщение для проверки кодека при запуске: дробные координаты и скорости
+# должны пройти туда и обратно без потери знаков, строки с кавычками,
+# переводом строки и кириллицей не должны ломать построчный протокол
+PROBE = {
+    'y': [1.0309999999999999, 0.1, 1. / 3, 2.5e-05, -7.000000000000001, 1e+22],
+    'id': [0, -1, 2 ** 40],
+    'text': 'строка "с" \\ кавычками\n',
+    'elevator': None,
+    'ok': [True, False],
+    'nested': [{'state': 1, 'passengers': []}],
+}
+
+
+class JsonCodec:
+    name = 'json'
+
+    def dumps(self, message) -> bytes:
+        return json.dumps(message, separators=(',', ':')).encode()
+
+    def loads(self, data):
+        return json.loads(data, strict=False)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.module = ujson
+
+    def dumps(self, message) -> bytes:
+        return self.module.dumps(message, ensure_ascii=True, escape_forward_slashes=False).encode()
+
+    def loads(self, data):
+        try:
+            return self.module.loads(data)
+        except ValueError:
+            # Разбор, который ujson не принимает (например, управляющие символы
+            # внутри строк), остается за стандартным json
+            return JsonCodec.loads(self, data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.module = orjson
+
+    def dumps(self, message) -> bytes:
+        return self.module.dumps(message)
+
+    def loads(self, data):
+        try:
+            return self.module.loads(data)
+        except ValueError:
+            return JsonCodec.loads(self, data)
+
+
+CODECS = (OrjsonCodec, UjsonCodec, JsonCodec)
+
+
+def is_exact(codec) -> bool:
+    reference = JsonCodec()
+    try:
+        data = codec.dumps(PROBE)
+        return (b'\n' not in data and
+                codec.loads(data) == PROBE and
+                reference.loads(data) == PROBE and
+                codec.loads(reference.dumps(PROBE)) == PROBE)
+    except Exception:
+        return False
+
+
+def available_codecs() -> list:
+    codecs = []
+    for codec_class in CODECS:
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            pass
+    return codecs
+
+
+def select_codec(name=None):
+    # Самый быстрый из установленных кодеков, который прошел проверку PROBE.
+    # JSON_CODEC=json принудительно включает стандартный json
+    name = name or os.environ.get('JSON_CODEC')
+    for codec in available_codecs():
+        if name and codec.name != name:
+            continue
+        if is_exact(codec):
+            return codec
+    return JsonCodec()
+
+
+codec = select_codec()
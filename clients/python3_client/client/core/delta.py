@@ -0,0 +1,35 @@
+STATE_LISTS = ('my_elevators', 'enemy_elevators', 'my_passengers', 'enemy_passengers')
+
+
+# Восстанавливает полное состояние мира из сообщений протокола delta
+class DeltaDecoder:
+    def __init__(self):
+        self.entities = {name: {} for name in STATE_LISTS}
+        self.ids = {name: [] for name in STATE_LISTS}
+
+    def decode(self, message: dict) -> dict:
+        state = {k: v for k, v in message.items() if k not in STATE_LISTS}
+        for name in STATE_LISTS:
+            entities = self.entities[name]
+            for delta in message[name]['changed']:
+                entity = entities.get(delta['id'])
+                if entity is None:
+                    entities[delta['id']] = dict(delta)
+                else:
+                    entity.update(delta)
+
+            ids = message[name].get('ids')
+            if ids is not None:
+                self.ids[name] = ids
+                alive = set(ids)
+                for entity_id in [k for k in entities if k not in alive]:
+                    del entities[entity_id]
+
+        passengers = dict(self.entities['my_passengers'])
+        passengers.update(self.entities['enemy_passengers'])
+        for name in STATE_LISTS:
+            entities = self.entities[name]
+            state[name] = [entities[entity_id] for entity_id in self.ids[name]]
+        for name in ('my_elevators', 'enemy_elevators'):
+            state[name] = [dict(e, passengers=[passengers[p] for p in e['passengers']]) for e in state[name]]
+        return state
@@ -0,0 +1,39 @@
+import struct
+
+# Кадр бинарного протокола: длина тела (4 байта, big-endian) и само тело
+HEADER = struct.Struct('>I')
+
+
+class MsgpackFraming:
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.module = msgpack
+        self.packer = msgpack.Packer(use_bin_type=True)
+        self.unpack_options = {'raw': False}
+        if msgpack.version >= (1, 0):
+            self.unpack_options['strict_map_key'] = False
+
+    def dump(self, message) -> bytes:
+        body = self.packer.pack(message)
+        return HEADER.pack(len(body)) + body
+
+    def load(self, body: bytes):
+        return self.module.unpackb(body, **self.unpack_options)
+
+
+FRAMINGS = {
+    'msgpack': MsgpackFraming,
+}
+
+
+def create_framing(name):
+    # None, если формат неизвестен или его библиотека не установлена
+    framing_class = FRAMINGS.get(name)
+    if framing_class is None:
+        return None
+    try:
+        return framing_class()
+    except ImportError:
+        return None
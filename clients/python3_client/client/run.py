@@ -1,52 +1,124 @@
 import os
 import socket
-import json
-from asyncio import get_event_loop, open_connection
+from asyncio import IncompleteReadError, get_event_loop, open_connection, sleep
 from core.api import API
+from core.codec import codec
+from core.delta import DeltaDecoder
+from core.framing import HEADER, create_framing
 
 
 class Client:
-    def __init__(self, loop, solution_id):
+    reconnect_delay = 0.2
+
+    def __init__(self, loop, solution_id, protocol=None, message_format=None):
         self.solution_id = solution_id
-        self.api = API()
+        self.protocol = protocol
+        self.format = message_format if create_framing(message_format) else None
+        self.decoder = None
+        self.framing = None
+        self.api = API(keep_strategy=os.environ.get('KEEP_STRATEGY') == '1',
+                       pool_objects=os.environ.get('POOL_OBJECTS') == '1')
         self.loop = loop
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, 0)
         self.sock.setblocking(False)
 
     async def ask_for_grant(self, reader, writer):
-        await self.send_to_server({
-            'solution_id': self.solution_id
-        }, writer)
+        handshake = {'solution_id': self.solution_id}
+        if self.protocol:
+            handshake['protocol'] = self.protocol
+        if self.format:
+            handshake['format'] = self.format
+        await self.send_to_server(handshake, writer)
 
-        data = await reader.readuntil(b'\n')
-        data = json.loads(data)
+        data = await self.read_message(reader)
         grant = data.get('message') == 'beginning'
+        if data.get('protocol') == 'delta':
+            self.decoder = DeltaDecoder()
+        if data.get('format'):
+            self.framing = create_framing(data['format'])
         return grant, reader
 
+    async def read_message(self, reader):
+        if self.framing:
+            header = await reader.readexactly(HEADER.size)
+            body = await reader.readexactly(HEADER.unpack(header)[0])
+            return self.framing.load(body)
+        data = await reader.readuntil(b'\n')
+        return codec.loads(data)
+
     async def send_to_server(self, message, writer):
-        message = json.dumps(message).encode('unicode_escape') + b'\n'
+        if self.framing:
+            message = self.framing.dump(message)
+        else:
+            message = codec.dumps(message) + b'\n'
         writer.write(message)
         return await writer.drain()
 
-    async def start(self, host, port):
-        reader, writer = await open_connection(host, port)
-        grant, reader = await self.ask_for_grant(reader, writer)
-        while grant:
-            data = await reader.readuntil(b'\n')
-            data = json.loads(data)
+    async def connect(self, host, port, timeout):
+        # Между играми сервер может быть еще не готов: пробуем, пока не выйдет timeout
+        deadline = self.loop.time() + timeout
+        while True:
+            try:
+                return await open_connection(host, port)
+            except OSError:
+                if self.loop.time() >= deadline:
+                    raise
+                await sleep(self.reconnect_delay)
 
-            if data.get('message') == 'down':
-                break
+    async def play(self, reader, writer, new_game=False):
+        self.decoder = None
+        self.framing = None
+        try:
+            grant, reader = await self.ask_for_grant(reader, writer)
+        except (IncompleteReadError, ConnectionError):
+            return False
+        if grant and new_game:
+            self.api.new_game()
+        try:
+            while grant:
+                data = await self.read_message(reader)
 
-            actions = self.api.generate_actions(data)
-            await self.send_to_server(actions, writer)
+                if data.get('message') == 'down':
+                    break
+                if self.decoder:
+                    data = self.decoder.decode(data)
+
+                actions = self.api.generate_actions(data)
+                await self.send_to_server(actions, writer)
+        except (IncompleteReadError, ConnectionError):
+            # Сервер закрыл соединение посреди игры (лимит времени, перезапуск):
+            # игра для нас закончена, следующая начнется с нового подключения
+            pass
+        return grant
+
+    async def start(self, host, port, games=1, timeout=10):
+        # games игр подряд (0 - пока сервер принимает): интерпретатор и модуль
+        # стратегии загружаются один раз, перед каждой игрой API готовит стратегию заново
+        played = 0
+        while not games or played < games:
+            try:
+                reader, writer = await self.connect(host, port, timeout)
+            except OSError:
+                break
+            try:
+                grant = await self.play(reader, writer, played > 0)
+            finally:
+                writer.close()
+            if not grant:
+                break
+            played += 1
+        return played
 
 
 world_host = os.environ.get('WORLD_NAME', '127.0.0.1')
-world_port = 8000
+world_port = int(os.environ.get('WORLD_PORT', 8000))
 solution_id = os.environ.get('SOLUTION_ID', 1)
+protocol = os.environ.get('PROTOCOL')
+message_format = os.environ.get('MESSAGE_FORMAT')
+games = int(os.environ.get('GAMES', 1))
+reconnect_timeout = float(os.environ.get('RECONNECT_TIMEOUT', 10))
 
 loop = get_event_loop()
-client = Client(loop, solution_id)
-future = client.start(world_host, world_port)
+client = Client(loop, solution_id, protocol, message_format)
+future = client.start(world_host, world_port, games, reconnect_timeout)
 loop.run_until_complete(future)
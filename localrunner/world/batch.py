@@ -0,0 +1,55 @@
+# coding=utf-8
+import argparse
+import json
+import sys
+from itertools import permutations
+from multiprocessing import Pool, cpu_count
+
+from core.headless import play_match
+
+
+def parse_seeds(value):
+    seeds = []
+    for part in value.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            seeds.extend(range(int(first), int(last) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def parse_pair(value):
+    red_dir, blue_dir = value.split(',')
+    return red_dir, blue_dir
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Пакетный прогон headless-игр на всех ядрах')
+    parser.add_argument('--seeds', type=parse_seeds, required=True, help=u'1-100 или 1,5,7')
+    parser.add_argument('--pair', type=parse_pair, action='append', default=[], help=u'red_client_dir,blue_client_dir')
+    parser.add_argument('--round-robin', nargs='+', default=[], help=u'каждая пара клиентов играет за оба цвета')
+    parser.add_argument('--processes', type=int, default=cpu_count())
+    parser.add_argument('--output', default='results.jsonl')
+    args = parser.parse_args(argv[1:])
+
+    pairs = args.pair + list(permutations(args.round_robin, 2))
+    if not pairs:
+        parser.error('no strategy pairs, use --pair or --round-robin')
+
+    tasks = [(seed, red_dir, blue_dir) for seed in args.seeds for red_dir, blue_dir in pairs]
+    pool = Pool(processes=args.processes)
+    try:
+        with open(args.output, 'w') as f:
+            for result in pool.imap(play_match, tasks):
+                f.write(json.dumps(result, separators=(',', ':')))
+                f.write('\n')
+                f.flush()
+    finally:
+        pool.close()
+        pool.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
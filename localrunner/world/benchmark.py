@@ -0,0 +1,155 @@
+# coding=utf-8
+import argparse
+import json
+import resource
+import sys
+import time
+from multiprocessing import Pool
+
+from core import settings
+from core.api import API
+
+RED = settings.PLAYERS['FIRST_PLAYER_KEY']
+BLUE = settings.PLAYERS['SECOND_PLAYER_KEY']
+
+
+def go_to_floor(elevator, floor):
+    return {'command': 'go_to_floor', 'args': {'elevator_id': elevator['id'], 'floor': floor}}
+
+
+def set_elevator_to_passenger(elevator, passenger):
+    return {'command': 'set_elevator_to_passenger', 'args': {'passenger_id': passenger['id'], 'elevator_id': elevator['id']}}
+
+
+def idle_strategy(state, tick):
+    return []
+
+
+def baseline_strategy(state, tick):
+    # baseline/python3_client/strategy.py поверх словарей состояния
+    commands = []
+    for elevator in state['my_elevators']:
+        for p in state['my_passengers']:
+            if p['state'] >= 5:
+                continue
+            if elevator['state'] != 1:
+                commands.append(go_to_floor(elevator, p['from_floor']))
+            if elevator['floor'] == p['from_floor']:
+                commands.append(set_elevator_to_passenger(elevator, p))
+        if elevator['passengers'] and elevator['state'] != 1:
+            commands.append(go_to_floor(elevator, elevator['passengers'][0]['dest_floor']))
+    return commands
+
+
+def flood_strategy(state, tick):
+    # Каждый тик назначает каждому видимому пассажиру каждый свой лифт
+    commands = []
+    passengers = state['my_passengers'] + state['enemy_passengers']
+    for elevator in state['my_elevators']:
+        for p in passengers:
+            commands.append(set_elevator_to_passenger(elevator, p))
+        commands.append(go_to_floor(elevator, tick % settings.BUILDING['FLOORS_COUNT'] + 1))
+    return commands
+
+
+STRATEGIES = {
+    'idle': idle_strategy,
+    'baseline': baseline_strategy,
+    'flood': flood_strategy,
+}
+
+
+def configure(floors, elevators, spawn_every=None):
+    for config in (settings.BUILDING, settings.BUILDING_VISIO):
+        config['FLOORS_COUNT'] = floors
+        config['ELEVATORS_FOR_PASSENGER_COUNT'] = elevators
+    if spawn_every:
+        settings.BUILDING['TICK_TO_SPAWN'] = spawn_every
+
+
+def run_case(case):
+    configure(case['floors'], case['elevators'], case['spawn_every'])
+    strategy = STRATEGIES[case['strategy']]
+    phases = dict.fromkeys(('get_state_for', 'strategy', 'apply_commands', 'tick', 'get_visio_state'), 0.)
+
+    started = time.time()
+    api = API(case['seed'], backend=case['backend'])
+    api.create_players(RED, BLUE)
+    for tick in range(case['ticks']):
+        t0 = time.time()
+        blue_state = api.get_world_state_for(BLUE)
+        red_state = api.get_world_state_for(RED)
+        t1 = time.time()
+        blue_commands = strategy(blue_state, tick)
+        red_commands = strategy(red_state, tick)
+        t2 = time.time()
+        api.apply_commands(blue_commands, BLUE)
+        api.apply_commands(red_commands, RED)
+        t3 = time.time()
+        api.tick()
+        t4 = time.time()
+        api.get_visio_state()
+        t5 = time.time()
+
+        phases['get_state_for'] += t1 - t0
+        phases['strategy'] += t2 - t1
+        phases['apply_commands'] += t3 - t2
+        phases['tick'] += t4 - t3
+        phases['get_visio_state'] += t5 - t4
+    total = time.time() - started
+
+    return dict(case, **{
+        'total_time': round(total, 4),
+        'ticks_per_second': round(case['ticks'] / total, 1),
+        'phases': {k: round(v, 4) for k, v in phases.iteritems()},
+        'scores': {RED: api.world.building.get_score_for(RED), BLUE: api.world.building.get_score_for(BLUE)},
+        'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Микробенчмарки движка мира')
+    parser.add_argument('--ticks', type=int_list, default=[2000, 7200])
+    parser.add_argument('--floors', type=int_list, default=[9])
+    parser.add_argument('--elevators', type=int_list, default=[4])
+    parser.add_argument('--spawn-every', type=int_list, default=[settings.BUILDING['TICK_TO_SPAWN']],
+                        help=u'раз во сколько тиков появляются пассажиры')
+    parser.add_argument('--strategies', default='idle,baseline,flood')
+    parser.add_argument('--seeds', type=int_list, default=[1])
+    parser.add_argument('--backends', default='python')
+    parser.add_argument('--output')
+    args = parser.parse_args(argv[1:])
+
+    cases = [{'ticks': ticks, 'floors': floors, 'elevators': elevators, 'spawn_every': spawn_every,
+              'strategy': strategy, 'seed': seed, 'backend': backend}
+             for backend in args.backends.split(',')
+             for ticks in args.ticks
+             for floors in args.floors
+             for elevators in args.elevators
+             for spawn_every in args.spawn_every
+             for strategy in args.strategies.split(',')
+             for seed in args.seeds]
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    # Каждый замер идет в отдельном процессе, по одному за раз:
+    # так пиковая память не накапливается между замерами, а ядра не делятся
+    pool = Pool(processes=1, maxtasksperchild=1)
+    try:
+        for result in pool.imap(run_case, cases):
+            output.write(json.dumps(result, sort_keys=True))
+            output.write('\n')
+            output.flush()
+    finally:
+        pool.close()
+        pool.join()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,77 @@
+# coding=utf-8
+import argparse
+import json
+import sys
+import time
+
+from benchmark import BLUE, RED, STRATEGIES, configure, int_list
+from core.api import API
+from core.codec import JsonCodec, available_codecs, is_exact
+
+
+class LegacyCodec(JsonCodec):
+    # Как сообщения кодировались до core/codec.py
+    name = 'legacy'
+
+    def dumps(self, message):
+        return json.dumps(message, separators=(',', ':')).encode('string-escape')
+
+
+def collect_states(ticks, seed, strategy):
+    # Настоящие сообщения get_state_for обоих игроков за игру
+    api = API(seed)
+    api.create_players(RED, BLUE)
+    states = []
+    for tick in range(ticks):
+        for player in (BLUE, RED):
+            state = api.get_world_state_for(player)
+            states.append(state)
+            api.apply_commands(strategy(state, tick), player)
+        api.tick()
+    return states
+
+
+def measure(codec, states, repeat):
+    best_dumps = best_loads = None
+    for _ in range(repeat):
+        started = time.time()
+        messages = [codec.dumps(state) for state in states]
+        dumps_time = time.time() - started
+
+        started = time.time()
+        for message in messages:
+            codec.loads(message)
+        loads_time = time.time() - started
+
+        best_dumps = dumps_time if best_dumps is None else min(best_dumps, dumps_time)
+        best_loads = loads_time if best_loads is None else min(best_loads, loads_time)
+
+    return {
+        'codec': codec.name,
+        'exact': is_exact(codec),
+        'messages': len(states),
+        'bytes': sum(len(m) for m in messages),
+        'dumps_us': round(best_dumps / len(states) * 1e6, 2),
+        'loads_us': round(best_loads / len(states) * 1e6, 2),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Сравнение json-кодеков на сообщениях get_state_for')
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--floors', type=int, default=9)
+    parser.add_argument('--elevators', type=int, default=4)
+    parser.add_argument('--strategy', default='baseline')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    configure(args.floors, args.elevators)
+    states = collect_states(args.ticks, args.seed, STRATEGIES[args.strategy])
+    for codec in [LegacyCodec()] + available_codecs():
+        print json.dumps(measure(codec, states, args.repeat), sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
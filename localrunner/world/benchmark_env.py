@@ -0,0 +1,66 @@
+# coding=utf-8
+import argparse
+import functools
+import json
+import sys
+import time
+
+from benchmark import STRATEGIES, configure
+from core.env import Env, ProcessVectorEnv, VectorEnv
+
+
+def measure(envs, strategy, steps, arrays):
+    observations = envs.reset()
+    started = time.time()
+    games = 0
+    for _ in range(steps):
+        # Стратегии из benchmark.py читают словари, с --arrays своя сторона бездействует
+        if arrays:
+            actions = [[] for _ in observations]
+        else:
+            actions = [strategy(observation, observation['tick']) for observation in observations]
+        observations, rewards, dones, infos = envs.step(actions)
+        games += sum(dones)
+    elapsed = time.time() - started
+    envs.close()
+    return elapsed, games
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Скорость VectorEnv в шагах сред за секунду')
+    parser.add_argument('--envs', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=0)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--floors', type=int, default=9)
+    parser.add_argument('--elevators', type=int, default=4)
+    parser.add_argument('--strategy', default='baseline')
+    parser.add_argument('--backend')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--arrays', action='store_true')
+    args = parser.parse_args(argv[1:])
+
+    configure(args.floors, args.elevators)
+    strategy = STRATEGIES[args.strategy]
+    env_fns = [functools.partial(Env, seed=args.seed + i, backend=args.backend, opponent=strategy)
+               for i in range(args.envs)]
+    if args.processes:
+        envs = ProcessVectorEnv(env_fns, args.processes, arrays=args.arrays)
+    else:
+        envs = VectorEnv(env_fns, arrays=args.arrays)
+
+    elapsed, games = measure(envs, strategy, args.steps, args.arrays)
+    print json.dumps({
+        'envs': args.envs,
+        'processes': args.processes,
+        'arrays': args.arrays,
+        'backend': args.backend or 'python',
+        'strategy': args.strategy,
+        'steps': args.steps * args.envs,
+        'games': games,
+        'steps_per_second': round(args.steps * args.envs / elapsed, 1),
+    }, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
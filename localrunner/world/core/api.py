@@ -1,16 +1,20 @@
+# coding=utf-8
+import copy
+
 from core import settings
 from core.world import World
 
 
 class API(object):
-    def __init__(self):
-        self.world = World()
+    def __init__(self, seed=None, backend=None):
+        self.world = World(seed, backend)
         self.exception_text = []
         self.log_text = []
         self.client_player = {}
         self.red_client = None
         self.blue_client = None
         self.player_debug = {}
+        self.command_log = None
 
     def get_world_state_for(self, client):
         return self.world.get_state_for(self.client_player[client])
@@ -40,6 +44,8 @@ class API(object):
 
     def apply_commands(self, commands, client):
         player = self.client_player.get(client)
+        if self.command_log:
+            self.command_log.record(self.world.counter, player, commands)
         for command in commands:
             command_name = command.get("command")
             args = command.get("args")
@@ -51,10 +57,31 @@ class API(object):
                     method_to_call(player=player, **args)
                 except TypeError:
                     pass
+        if commands:
+            self.world.invalidate()
 
     def tick(self):
         self.world.tick()
 
+    def fast_forward(self, limit):
+        return self.world.fast_forward(limit)
+
+    def is_finished(self, ticks_left=None):
+        return self.world.is_finished(ticks_left)
+
+    def snapshot(self):
+        return self.world.snapshot()
+
+    def restore(self, data):
+        self.world = World.restore(data)
+
+    def clone(self):
+        # Копия для просчета вариантов: мир копируется целиком, игроки те же
+        api = copy.copy(self)
+        api.world = self.world.clone()
+        api.player_debug = {k: {'exceptions': [], 'logs': [], 'fatal_error': []} for k in self.player_debug}
+        return api
+
     def get_visio_state(self):
         world_state = self.world.get_visio_state()
         world_state.update({'debug': {k: v for k, v in self.player_debug.iteritems()}})
@@ -65,23 +92,20 @@ class API(object):
         return self.world.get_state()
 
     def go_to_floor(self, player, floor, elevator_id):
-        elevator = filter(lambda x: x.id == elevator_id, self.world.get_elevator_for(player))
+        elevator = self.world.building.get_player_elevator_by_id(player, elevator_id)
         if not elevator:
             return
-        elevator = elevator[0]
         if isinstance(floor, int):
             elevator.go_to_floor(floor)
 
     def set_elevator_to_passenger(self, player, passenger_id, elevator_id):
-        elevator = filter(lambda x: x.id == elevator_id, self.world.get_elevator_for(player))
-        passenger = filter(lambda x: x.id == passenger_id, self.world.get_passengers())
+        elevator = self.world.building.get_player_elevator_by_id(player, elevator_id)
+        passenger = self.world.building.get_passenger_by_id(passenger_id)
         if not passenger:
             return
-        passenger = passenger[0]
 
         if not elevator:
             return
-        elevator = elevator[0]
         self.world.building.set_passenger_elevator(passenger, elevator)
 
     def exception(self, player, text):
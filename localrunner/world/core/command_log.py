@@ -0,0 +1,58 @@
+# coding=utf-8
+from core import settings
+from core.codec import codec
+from core.replay import open_replay_file
+
+# Только эти команды меняют мир, остальные (log, exception, fatal_error)
+# нужны лишь визуализатору и в журнал не пишутся
+WORLD_COMMANDS = ('go_to_floor', 'set_elevator_to_passenger')
+CONFIG_KEYS = ('FLOORS_COUNT', 'ELEVATORS_FOR_PASSENGER_COUNT')
+
+
+def world_commands(commands):
+    return [c for c in commands if isinstance(c, dict) and c.get('command') in WORLD_COMMANDS]
+
+
+class CommandLogWriter(object):
+    # Журнал команд игроков для повторного прогона мира без клиентов:
+    # заголовок с seed и размерами здания, затем строка [tick, player, commands]
+    # на каждый вызов apply_commands с командами мира в порядке применения,
+    # в конце строка с итоговым тиком и счетом
+    def __init__(self, path, seed):
+        self.path = path
+        self.file = open_replay_file(path, 'wb')
+        self.write({'seed': seed, 'config': {k: settings.BUILDING[k] for k in CONFIG_KEYS}})
+
+    def write(self, line):
+        self.file.write(codec.dumps(line))
+        self.file.write('\n')
+
+    def record(self, tick, player, commands):
+        commands = world_commands(commands)
+        if commands:
+            self.write([tick, player, commands])
+
+    def close(self, ticks, scores):
+        if self.file.closed:
+            return
+        self.write({'ticks': ticks, 'scores': scores})
+        self.file.close()
+
+
+class CommandLogReader(object):
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self.ticks = None
+        self.scores = None
+        with open_replay_file(path, 'rb') as f:
+            header = codec.loads(f.readline())
+            for line in f:
+                line = codec.loads(line)
+                if isinstance(line, dict):
+                    self.ticks = line['ticks']
+                    self.scores = line['scores']
+                else:
+                    self.entries.append(line)
+        self.seed = header['seed']
+        self.config = header['config']
@@ -0,0 +1,46 @@
+# coding=utf-8
+STATE_LISTS = ('my_elevators', 'enemy_elevators', 'my_passengers', 'enemy_passengers')
+
+
+def is_changed(old, new):
+    return old != new or type(old) is not type(new)
+
+
+class DeltaEncoder(object):
+    # Каждый тик отправляет клиенту только новые и изменившиеся поля сущностей.
+    # Пассажиры внутри лифтов передаются списком id: все они есть в my_passengers
+    # или enemy_passengers того же сообщения. ids отправляется, только когда
+    # поменялся состав или порядок списка
+    def __init__(self):
+        self.entities = {name: {} for name in STATE_LISTS}
+        self.ids = {name: [] for name in STATE_LISTS}
+
+    def encode(self, state):
+        message = {k: v for k, v in state.iteritems() if k not in STATE_LISTS}
+        for name in STATE_LISTS:
+            known = self.entities[name]
+            current = {}
+            ids = []
+            changed = []
+            for entity in state[name]:
+                if 'passengers' in entity:
+                    entity = dict(entity, passengers=[p['id'] for p in entity['passengers']])
+                entity_id = entity['id']
+                ids.append(entity_id)
+                current[entity_id] = entity
+
+                old = known.get(entity_id)
+                if old is None:
+                    changed.append(entity)
+                    continue
+                delta = {k: v for k, v in entity.iteritems() if is_changed(old.get(k), v)}
+                if delta:
+                    delta['id'] = entity_id
+                    changed.append(delta)
+
+            message[name] = {'changed': changed}
+            if ids != self.ids[name]:
+                message[name]['ids'] = ids
+            self.entities[name] = current
+            self.ids[name] = ids
+        return message
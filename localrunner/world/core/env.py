@@ -0,0 +1,242 @@
+# coding=utf-8
+import ctypes
+import multiprocessing
+import operator
+import os
+import random
+from multiprocessing.sharedctypes import RawArray
+
+from core import settings
+from core.api import API
+
+FIRST_PLAYER = settings.PLAYERS['FIRST_PLAYER_KEY']
+SECOND_PLAYER = settings.PLAYERS['SECOND_PLAYER_KEY']
+
+
+class Env(object):
+    # Мир как среда reset/step без сервера и клиентов. Наблюдение - то же состояние,
+    # что клиент получает от сервера (get_state_for и номер тика), действие - список
+    # команд, как для apply_commands. Соперник - функция (state, tick) -> commands,
+    # без него второй игрок ничего не делает. Награда - прирост своего счета за тик
+    ticks_count = int(os.environ.get('TICKS_COUNT', 7200))
+
+    def __init__(self, seed=None, backend=None, opponent=None, player=FIRST_PLAYER, ticks_count=None,
+                 early_finish=False):
+        self.seed = seed
+        # Без seed каждая игра берет свой: иначе API возьмет общий на процесс
+        # settings.BUILDING['SEED'], и все среды играли бы одну и ту же игру
+        self.rng = random.Random()
+        self.backend = backend
+        self.opponent = opponent
+        self.player = player
+        self.enemy = SECOND_PLAYER if player == FIRST_PLAYER else FIRST_PLAYER
+        self.ticks_count = ticks_count or self.ticks_count
+        self.early_finish = early_finish
+        self.api = None
+        self.score = 0
+
+    def reset(self, seed=None):
+        # Новая игра: с seed, если он передан, иначе с seed среды, иначе со случайным
+        if seed is None:
+            seed = self.seed if self.seed is not None else self.rng.randint(0, 10000000)
+        self.api = API(seed, self.backend)
+        self.api.create_players(FIRST_PLAYER, SECOND_PLAYER)
+        self.score = 0
+        return self.observe()
+
+    def observe(self, player=None):
+        return dict(self.api.get_world_state_for(player or self.player), tick=self.api.world.counter)
+
+    def step(self, commands):
+        # Оба игрока видят мир до команд, команды применяются в порядке blue, red, как в run.py
+        actions = {self.player: commands, self.enemy: []}
+        if self.opponent:
+            actions[self.enemy] = self.opponent(self.observe(self.enemy), self.api.world.counter)
+        for player in (SECOND_PLAYER, FIRST_PLAYER):
+            self.api.apply_commands(actions[player], player)
+        self.api.tick()
+
+        world = self.api.world
+        score = world.building.get_score_for(self.player)
+        reward = score - self.score
+        self.score = score
+        ticks_left = self.ticks_count - world.counter
+        done = ticks_left <= 0 or (self.early_finish and self.api.is_finished(ticks_left))
+        info = {
+            'seed': world.seed,
+            'tick': world.counter,
+            'scores': {p: world.building.get_score_for(p) for p in (FIRST_PLAYER, SECOND_PLAYER)},
+        }
+        return self.observe(), reward, done, info
+
+
+def autoreset_step(env, commands):
+    # Закончившаяся игра сразу начинается заново: наблюдение уже из новой игры,
+    # а info (счет, тик) - из закончившейся
+    observation, reward, done, info = env.step(commands)
+    if done:
+        observation = env.reset()
+    return observation, reward, done, info
+
+
+ELEVATOR_FIELDS = ('id', 'y', 'floor', 'state', 'speed', 'next_floor', 'time_on_floor')
+PASSENGER_FIELDS = ('id', 'x', 'y', 'floor', 'state', 'time_to_away', 'from_floor', 'dest_floor', 'weight')
+
+
+class ArrayObservation(object):
+    # Наблюдение в массивах float64 фиксированной раскладки поверх общей памяти.
+    # elevators - строки ELEVATOR_FIELDS, число пассажиров и 1 для своих лифтов
+    # (сначала свои); passengers - строки PASSENGER_FIELDS, id лифта (-1 - без лифта)
+    # и 1 для своих пассажиров. Массивы - представления буфера: step их перезаписывает
+    capacity = 4096
+
+    def __init__(self, capacity=None):
+        import numpy
+        self.capacity = capacity or self.capacity
+        elevators_count = 2 * settings.BUILDING['ELEVATORS_FOR_PASSENGER_COUNT']
+        elevator_width = len(ELEVATOR_FIELDS) + 2
+        passenger_width = len(PASSENGER_FIELDS) + 2
+        self.buffer = RawArray(ctypes.c_double, 2 + elevators_count * elevator_width + self.capacity * passenger_width)
+        data = numpy.frombuffer(self.buffer, dtype=numpy.float64)
+        self.header = data[:2]
+        self.elevators = data[2:2 + elevators_count * elevator_width].reshape(elevators_count, elevator_width)
+        self.all_passengers = data[2 + elevators_count * elevator_width:].reshape(self.capacity, passenger_width)
+        self.elevator_fields = operator.itemgetter(*ELEVATOR_FIELDS)
+        self.passenger_fields = operator.itemgetter(*PASSENGER_FIELDS)
+
+    @property
+    def tick(self):
+        return int(self.header[0])
+
+    @property
+    def passengers(self):
+        return self.all_passengers[:int(self.header[1])]
+
+    def write(self, state):
+        elevators = [self.elevator_fields(e) + (len(e['passengers']), 1) for e in state['my_elevators']]
+        elevators += [self.elevator_fields(e) + (len(e['passengers']), 0) for e in state['enemy_elevators']]
+        self.elevators[:] = elevators
+
+        count = len(state['my_passengers']) + len(state['enemy_passengers'])
+        if count > self.capacity:
+            raise ValueError('{} passengers do not fit into ArrayObservation(capacity={})'.format(count, self.capacity))
+        passengers = [self.passenger_fields(p) + (-1 if p['elevator'] is None else p['elevator'], 1)
+                      for p in state['my_passengers']]
+        passengers += [self.passenger_fields(p) + (-1 if p['elevator'] is None else p['elevator'], 0)
+                       for p in state['enemy_passengers']]
+        if passengers:
+            self.all_passengers[:count] = passengers
+        self.header[:] = (state['tick'], count)
+        return self
+
+
+class VectorEnv(object):
+    # N независимых сред за один вызов step: списки наблюдений, наград, done и info.
+    # env_fns - функции без аргументов, создающие Env. Закончившиеся игры
+    # перезапускаются сами (autoreset_step). С arrays=True наблюдения - ArrayObservation
+    # вместо словарей
+
+    def __init__(self, env_fns, arrays=False, capacity=None):
+        self.envs = [env_fn() for env_fn in env_fns]
+        self.count = len(self.envs)
+        self.arrays = [ArrayObservation(capacity) for _ in range(self.count)] if arrays else None
+
+    def observations(self, observations):
+        if self.arrays is None:
+            return observations
+        return [arrays.write(observation) for arrays, observation in zip(self.arrays, observations)]
+
+    def reset(self, seeds=None):
+        seeds = seeds or [None] * self.count
+        return self.observations([env.reset(seed) for env, seed in zip(self.envs, seeds)])
+
+    def step(self, actions):
+        results = [autoreset_step(env, commands) for env, commands in zip(self.envs, actions)]
+        observations, rewards, dones, infos = (list(column) for column in zip(*results))
+        return self.observations(observations), rewards, dones, infos
+
+    def close(self):
+        pass
+
+
+def env_worker(pipe, env_fns, arrays):
+    # Со своими ArrayObservation наблюдения остаются в общей памяти, а по каналу
+    # вместо них идет None, иначе словари идут по каналу как есть
+    envs = [env_fn() for env_fn in env_fns]
+
+    def observation(index, state):
+        if arrays is None:
+            return state
+        arrays[index].write(state)
+        return None
+
+    while True:
+        command, args = pipe.recv()
+        try:
+            if command == 'reset':
+                pipe.send([observation(i, env.reset(seed)) for i, (env, seed) in enumerate(zip(envs, args))])
+            elif command == 'step':
+                results = []
+                for i, (env, commands) in enumerate(zip(envs, args)):
+                    state, reward, done, info = autoreset_step(env, commands)
+                    results.append((observation(i, state), reward, done, info))
+                pipe.send(results)
+            elif command == 'close':
+                pipe.close()
+                return
+        except Exception as e:
+            pipe.send(e)
+
+
+class ProcessVectorEnv(VectorEnv):
+    # То же, что VectorEnv, но среды живут в processes воркерах и считают тики
+    # параллельно. Словари наблюдений идут по каналам, а с arrays=True воркеры
+    # пишут наблюдения прямо в общую память ArrayObservation, и по каналам идут
+    # только команды, награды и info
+
+    def __init__(self, env_fns, processes=None, arrays=False, capacity=None):
+        self.count = len(env_fns)
+        processes = min(processes or multiprocessing.cpu_count(), self.count)
+        self.arrays = [ArrayObservation(capacity) for _ in range(self.count)] if arrays else None
+        self.slices = [slice(i * self.count // processes, (i + 1) * self.count // processes) for i in range(processes)]
+        self.pipes = []
+        self.workers = []
+        for part in self.slices:
+            pipe, worker_pipe = multiprocessing.Pipe()
+            worker_arrays = self.arrays[part] if arrays else None
+            worker = multiprocessing.Process(target=env_worker, args=(worker_pipe, env_fns[part], worker_arrays))
+            worker.daemon = True
+            worker.start()
+            worker_pipe.close()
+            self.pipes.append(pipe)
+            self.workers.append(worker)
+
+    def call(self, command, args):
+        # Сначала задания всем воркерам, потом ответы: воркеры считают одновременно
+        for pipe, part in zip(self.pipes, self.slices):
+            pipe.send((command, args[part]))
+        results = [pipe.recv() for pipe in self.pipes]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return [item for result in results for item in result]
+
+    def observations(self, observations):
+        return observations if self.arrays is None else list(self.arrays)
+
+    def reset(self, seeds=None):
+        return self.observations(self.call('reset', seeds or [None] * self.count))
+
+    def step(self, actions):
+        results = self.call('step', list(actions))
+        observations = self.observations([r[0] for r in results])
+        return (observations, [r[1] for r in results], [r[2] for r in results], [r[3] for r in results])
+
+    def close(self):
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+            pipe.close()
+        for worker in self.workers:
+            worker.join()
+        self.pipes = []
+        self.workers = []
@@ -1,4 +1,6 @@
-from random import sample, randint
+# coding=utf-8
+from bisect import bisect_left, insort
+from collections import OrderedDict
 
 from core import settings
 from core.game_objects.elevator import Elevator
@@ -7,7 +9,8 @@ from core.utils import group_size_generator
 
 
 class Building(object):
-    def __init__(self):
+    def __init__(self, rng):
+        self.rng = rng
         self.floors_count = settings.BUILDING['FLOORS_COUNT']
         self.players_score = {
             settings.PLAYERS['FIRST_PLAYER_KEY']: 0,
@@ -29,9 +32,36 @@ class Building(object):
             settings.PLAYERS['FIRST_PLAYER_KEY']: first_player_elevators,
             settings.PLAYERS['SECOND_PLAYER_KEY']: second_player_elevators,
         }
-
-        self.all_passengers = []
+        self.players_elevators_by_id = {k: {e.id: e for e in v} for k, v in self.players_elevators.iteritems()}
+
+        # Пассажиры по id в порядке появления (он же порядок id). У игроков
+        # отдельно словарь по id и отсортированный список id: пассажир, которого
+        # довез чужой лифт, встает к новому хозяину на свое место по id
+        self.all_passengers = OrderedDict()
+        self.players_passengers = {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: {},
+            settings.PLAYERS['SECOND_PLAYER_KEY']: {},
+        }
+        self.players_passenger_ids = {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: [],
+            settings.PLAYERS['SECOND_PLAYER_KEY']: [],
+        }
+        # Пассажиры игроков по состояниям и состояние, под которым каждый пассажир
+        # лежит в этом индексе: состояния меняются в on_tick лифтов и пассажиров,
+        # а индекс догоняет их в Building.on_tick (index_state)
+        self.players_states = {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: {},
+            settings.PLAYERS['SECOND_PLAYER_KEY']: {},
+        }
+        self.indexed_states = {}
         self.passenger_id = 1
+        # Сколько пассажиров каждого игрока гуляет по каждому этажу (walking_on_floor),
+        # этажи без таких пассажиров не хранятся. Меняется только при смене
+        # состояния пассажира, поэтому кадр визуализатора не перебирает пассажиров
+        self.walking_passengers = {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: {},
+            settings.PLAYERS['SECOND_PLAYER_KEY']: {},
+        }
 
     def get_score_for(self, player):
         return self.players_score[player]
@@ -39,6 +69,88 @@ class Building(object):
     def get_player_elevator(self, player):
         return self.players_elevators.get(player)
 
+    def get_player_elevator_by_id(self, player, elevator_id):
+        return self.players_elevators_by_id[player].get(elevator_id)
+
+    def get_passengers(self):
+        return self.all_passengers.values()
+
+    def get_player_passengers(self, player):
+        passengers = self.players_passengers[player]
+        return [passengers[i] for i in self.players_passenger_ids[player]]
+
+    def serialize_visible_passengers(self, player):
+        # Пассажиры игрока, которых видят стратегии: все, кроме гуляющих по этажу
+        return [p.serialize() for p in self.get_player_passengers(player) if not p.is_walking_on_floor()]
+
+    def serialize_elevators(self, player, passengers):
+        return [e.serialize(passengers) for e in self.players_elevators[player]]
+
+    def get_passengers_in_state(self, player, state):
+        # Пассажиры игрока в состоянии state в порядке id
+        passengers = self.players_states[player].get(state)
+        if not passengers:
+            return []
+        return [passengers[i] for i in sorted(passengers)]
+
+    def get_passenger_by_id(self, passenger_id):
+        return self.all_passengers.get(passenger_id)
+
+    def get_waiting_passengers(self, player):
+        return dict(self.walking_passengers[player])
+
+    def count_walking(self, passenger, delta):
+        counts = self.walking_passengers[passenger.type]
+        count = counts.get(passenger.floor, 0) + delta
+        if count:
+            counts[passenger.floor] = count
+        else:
+            del counts[passenger.floor]
+
+    def add_passenger(self, passenger):
+        self.all_passengers[passenger.id] = passenger
+        self.add_player_passenger(passenger)
+
+    def remove_passenger(self, passenger):
+        del self.all_passengers[passenger.id]
+        self.remove_player_passenger(passenger)
+
+    def add_player_passenger(self, passenger):
+        self.players_passengers[passenger.type][passenger.id] = passenger
+        insort(self.players_passenger_ids[passenger.type], passenger.id)
+        self.players_states[passenger.type].setdefault(passenger.state, {})[passenger.id] = passenger
+        self.indexed_states[passenger.id] = passenger.state
+        if passenger.is_walking_on_floor():
+            self.count_walking(passenger, 1)
+
+    def remove_player_passenger(self, passenger):
+        # Вызывается после index_state: в индексах пассажир лежит под текущим состоянием
+        if passenger.is_walking_on_floor():
+            self.count_walking(passenger, -1)
+        del self.indexed_states[passenger.id]
+        del self.players_states[passenger.type][passenger.state][passenger.id]
+        ids = self.players_passenger_ids[passenger.type]
+        del ids[bisect_left(ids, passenger.id)]
+        del self.players_passengers[passenger.type][passenger.id]
+
+    def index_state(self, passenger):
+        state = self.indexed_states[passenger.id]
+        by_state = self.players_states[passenger.type]
+        del by_state[state][passenger.id]
+        by_state.setdefault(passenger.state, {})[passenger.id] = passenger
+        self.indexed_states[passenger.id] = passenger.state
+        if state == Passenger.WALKING_ON_FLOOR:
+            self.count_walking(passenger, -1)
+        elif passenger.is_walking_on_floor():
+            self.count_walking(passenger, 1)
+
+    def set_passenger_type(self, passenger, type):
+        if passenger.type == type:
+            return
+        self.remove_player_passenger(passenger)
+        passenger.type = type
+        self.add_player_passenger(passenger)
+
     def set_passenger_elevator(self, passenger, elevator):
         if (passenger.is_waiting_for_elevator() or passenger.is_returning()) and elevator.current_floor() == passenger.from_floor and elevator.is_filling() and not elevator.is_full():
             if passenger.elevator:
@@ -57,28 +169,54 @@ class Building(object):
                 return
 
     def spawn(self):
-        floors_queue = sample(range(2, settings.BUILDING['FLOORS_COUNT'] + 1),
-                              settings.BUILDING['FLOORS_QUEUE_LEN']()) + [settings.BUILDING["FIRST_FLOOR"]]
-        weight = settings.PASSENGERS['WEIGHT']()
+        floors_queue = self.rng.sample(range(2, settings.BUILDING['FLOORS_COUNT'] + 1),
+                                       settings.BUILDING['FLOORS_QUEUE_LEN'](self.rng)) + [settings.BUILDING["FIRST_FLOOR"]]
+        weight = settings.PASSENGERS['WEIGHT'](self.rng)
 
         passenger_x = settings.BUILDING['PASSENGER_SPAWN_POSITION']
         passenger_y = settings.BUILDING['FIRST_FLOOR']
 
         first_passenger = Passenger(self.passenger_id, -passenger_x, passenger_y, floors_queue, weight, settings.PLAYERS['FIRST_PLAYER_KEY'])
-        self.all_passengers.append(first_passenger)
+        self.add_passenger(first_passenger)
         self.passenger_id += 1
 
         second_passenger = Passenger(self.passenger_id, passenger_x, passenger_y, floors_queue, weight, settings.PLAYERS['SECOND_PLAYER_KEY'])
-        self.all_passengers.append(second_passenger)
+        self.add_passenger(second_passenger)
         self.passenger_id += 1
 
+    def can_score(self, ticks_left=None):
+        return any(p.can_score(ticks_left) for p in self.all_passengers.itervalues())
+
+    def idle_ticks(self, limit):
+        # Сколько тиков подряд ни у кого не меняется состояние и ни одна команда
+        # игроков ничего не меняет: все лифты едут, а пассажиры только
+        # досчитывают свои таймеры
+        for e in self.players_elevators[settings.PLAYERS['FIRST_PLAYER_KEY']] + self.players_elevators[settings.PLAYERS['SECOND_PLAYER_KEY']]:
+            limit = e.idle_ticks(limit)
+            if limit <= 0:
+                return 0
+        for p in self.all_passengers.itervalues():
+            limit = p.idle_ticks(limit)
+            if limit <= 0:
+                return 0
+        return limit
+
+    def skip(self, ticks):
+        for e in self.players_elevators[settings.PLAYERS['FIRST_PLAYER_KEY']] + self.players_elevators[settings.PLAYERS['SECOND_PLAYER_KEY']]:
+            e.skip(ticks)
+        for p in self.all_passengers.itervalues():
+            p.skip(ticks)
+
     def on_tick(self):
         for e in self.players_elevators[settings.PLAYERS['FIRST_PLAYER_KEY']] + self.players_elevators[settings.PLAYERS['SECOND_PLAYER_KEY']]:
             e.on_tick()
-        for p in list(self.all_passengers):
+        indexed_states = self.indexed_states
+        for p in self.all_passengers.values():
             p.on_tick()
+            if p.state != indexed_states[p.id]:
+                self.index_state(p)
             if p.is_reward_ready():
                 self.players_score[p.get_elevator_type()] += p.determine_score()
-                p.type = p.elevator.type
+                self.set_passenger_type(p, p.elevator.type)
             if p.is_for_delete():
-                self.all_passengers.remove(p)
+                self.remove_passenger(p)
@@ -1,14 +1,35 @@
+# coding=utf-8
+import math
+
 from core import settings
 
 class Elevator(object):
+    WAITING = 0
+    MOVING = 1
+    OPENING = 2
+    FILLING = 3
+    CLOSING = 4
+
     ELEVATOR_STATE = {
-        'waiting': 0,
-        'moving': 1,
-        'opening': 2,
-        'filling': 3,
-        'closing': 4
+        'waiting': WAITING,
+        'moving': MOVING,
+        'opening': OPENING,
+        'filling': FILLING,
+        'closing': CLOSING
     }
 
+    # Общие для всех лифтов константы живут в классе, а не в каждом экземпляре
+    speed = 1./settings.ELEVATORS['TICKS_PER_FLOOR']
+    soft_capacity = settings.ELEVATORS['SOFT_CAPACITY']
+    filling_delay = settings.ELEVATORS['FILLING_DELAY']
+    critical_capacity = settings.ELEVATORS['CRITICAL_CAPACITY']
+    time_on_the_floor_to_load_enemy_passenger = settings.ELEVATORS['TIME_ON_THE_FLOOR_TO_LOAD_ENEMY_PASSENGER']
+
+    __slots__ = ('id', 'x', 'y', 'floor', 'type', 'opening_ticks', 'closing_ticks',
+                 'time_to_floor', 'next_floor', 'passengers', 'time_on_the_floor',
+                 'time_on_the_floor_with_opened_doors', 'current_filling_delay', 'state',
+                 'load', 'loaded_speed')
+
     def __init__(self, id, x, y, floor, type):
         self.id = id
         self.x = x
@@ -16,34 +37,32 @@ class Elevator(object):
         self.floor = floor
         self.type = type
 
-        self.speed = 1./settings.ELEVATORS['TICKS_PER_FLOOR']
         self.opening_ticks = settings.ELEVATORS['OPENING_TICKS']
         self.closing_ticks = settings.ELEVATORS['CLOSING_TICKS']
-        self.soft_capacity = settings.ELEVATORS['SOFT_CAPACITY']
-        self.filling_delay = settings.ELEVATORS['FILLING_DELAY']
-        self.critical_capacity = settings.ELEVATORS['CRITICAL_CAPACITY']
-        self.time_on_the_floor_to_load_enemy_passenger = settings.ELEVATORS['TIME_ON_THE_FLOOR_TO_LOAD_ENEMY_PASSENGER']
 
         self.time_to_floor = 0
         self.next_floor = -1
         self.passengers = []
+        self.load = 1
+        self.loaded_speed = self.speed
         self.time_on_the_floor = 0
         self.time_on_the_floor_with_opened_doors = 0
         self.current_filling_delay = settings.ELEVATORS['FILLING_DELAY']
-        self.state = self.ELEVATOR_STATE['filling']
+        self.state = self.FILLING
 
     def on_tick(self):
-        if self.state != self.ELEVATOR_STATE['moving']:
+        state = self.state
+        if state != self.MOVING:
             self.time_on_the_floor += 1
 
-        if self.state == self.ELEVATOR_STATE['filling']:
+        if state == self.FILLING:
             self.time_on_the_floor_with_opened_doors += 1
         else:
             self.time_on_the_floor_with_opened_doors = 0
 
-        if self.next_floor != -1 and self.state == self.ELEVATOR_STATE['waiting']:
+        if self.next_floor != -1 and state == self.WAITING:
             if self.floor != self.next_floor:
-                self.state = self.ELEVATOR_STATE['moving']
+                self.state = self.MOVING
 
                 if self.y > self.next_floor:
                     self.time_to_floor = abs(self.floor - self.next_floor) / self.get_speed(with_weight=False)
@@ -51,49 +70,87 @@ class Elevator(object):
                     self.time_to_floor = abs(self.floor - self.next_floor) / self.get_speed()
 
             else:
-                self.state = self.ELEVATOR_STATE['opening']
+                self.state = self.OPENING
             return
 
-        if self.state == self.ELEVATOR_STATE['moving']:
+        if state == self.MOVING:
             self.time_on_the_floor = 0
             self.moving()
             return
 
-        if self.state == self.ELEVATOR_STATE['opening']:
+        if state == self.OPENING:
             self.opening_ticks -= 1
             if self.opening_ticks == 0:
                 self.next_floor = -1
-                self.state = self.ELEVATOR_STATE['filling']
+                self.state = self.FILLING
                 self.opening_ticks = settings.ELEVATORS['OPENING_TICKS']
                 return
             return
 
-        if self.state == self.ELEVATOR_STATE['filling']:
+        if state == self.FILLING:
             self.current_filling_delay -= 1
             if self.current_filling_delay <= 0:
                 can_close = True
             else:
                 can_close = False
 
+            exited = False
             for p in list(self.passengers):
                 if self.floor == p.dest_floor:
                     self.passengers.remove(p)
                     p.exit(self.floor)
+                    exited = True
                 can_close = can_close and p.is_using_elevator()
+            if exited:
+                self.update_load()
 
             if self.next_floor != -1 and can_close and self.next_floor != self.floor:
                 self.current_filling_delay = settings.ELEVATORS['FILLING_DELAY']
-                self.state = self.ELEVATOR_STATE['closing']
+                self.state = self.CLOSING
             return
 
-        if self.state == self.ELEVATOR_STATE['closing']:
+        if state == self.CLOSING:
             self.closing_ticks -= 1
             if self.closing_ticks == 0:
-                self.state = self.ELEVATOR_STATE['waiting']
+                self.state = self.WAITING
                 self.closing_ticks = settings.ELEVATORS['CLOSING_TICKS']
                 return
             return
 
+    def idle_ticks(self, limit):
+        # Сколько следующих тиков лифт только едет: в остальных состояниях
+        # go_to_floor меняет next_floor, и это видно стратегиям
+        if self.state == self.MOVING:
+            return min(limit, max(0, int(math.ceil(self.time_to_floor)) - 1))
+        return 0
+
+    def ticks_to_floor(self, floor):
+        # Не меньше стольких тиков пройдет, прежде чем лифт откроет двери на этаже floor:
+        # доехать (быстрее, чем без пассажиров, лифт не ездит) и открыть двери
+        ticks_per_floor = settings.ELEVATORS['TICKS_PER_FLOOR']
+        opening_ticks = settings.ELEVATORS['OPENING_TICKS']
+        if self.state == self.MOVING:
+            return self.time_to_floor + abs(self.next_floor - floor) * ticks_per_floor + opening_ticks
+        if self.floor == floor:
+            if self.state == self.FILLING:
+                return 0
+            if self.state == self.OPENING:
+                return self.opening_ticks
+        ticks = abs(self.floor - floor) * ticks_per_floor + opening_ticks
+        if self.state == self.CLOSING:
+            return ticks + self.closing_ticks
+        if self.state == self.OPENING:
+            return ticks + self.opening_ticks + settings.ELEVATORS['CLOSING_TICKS']
+        if self.state == self.FILLING:
+            return ticks + settings.ELEVATORS['CLOSING_TICKS']
+        return ticks
+
+    def skip(self, ticks):
+        self.time_on_the_floor = 0
+        self.time_on_the_floor_with_opened_doors = 0
+        for _ in xrange(ticks):
+            self.moving()
+
     def is_full(self):
         return len(self.passengers) == self.critical_capacity
 
@@ -102,27 +159,44 @@ class Elevator(object):
 
     def get_speed(self, with_weight=True):
         if with_weight:
-            multiple = reduce(lambda x, y: x * y, map(lambda x: x.weight, self.passengers), 1)
-            if len(self.passengers) > self.soft_capacity:
-                multiple *= settings.ELEVATORS['OVERLOAD_MULTIPLY']
-
-            return self.speed / multiple
+            return self.loaded_speed
         else:
             return self.speed
 
+    def update_load(self, load=None):
+        # Произведение весов считается слева направо, как раньше в get_speed:
+        # при входе вес домножается, при выходе произведение пересчитывается заново,
+        # чтобы не накапливать ошибку от деления
+        if load is None:
+            load = reduce(lambda x, y: x * y, map(lambda x: x.weight, self.passengers), 1)
+        self.load = load
+
+        multiple = load
+        if len(self.passengers) > self.soft_capacity:
+            multiple *= settings.ELEVATORS['OVERLOAD_MULTIPLY']
+        self.loaded_speed = self.speed / multiple
+
     def can_enter(self):
-        return self.state == self.ELEVATOR_STATE['filling'] and len(self.passengers) < self.critical_capacity
+        return self.state == self.FILLING and len(self.passengers) < self.critical_capacity
 
     def enter(self, passenger):
         if passenger not in self.passengers:
             self.passengers.append(passenger)
+            self.update_load(self.load * passenger.weight)
+
+    def leave(self, passenger):
+        if passenger in self.passengers:
+            self.passengers.remove(passenger)
+            self.update_load()
 
-    def serialize(self):
+    def serialize(self, passengers=None):
+        # passengers - уже сериализованные на этом тике пассажиры по id
+        passengers = passengers or {}
         return {
             "id": self.id,
             "state": self.state,
             "floor": self.floor,
-            "passengers": [p.serialize() for p in self.passengers],
+            "passengers": [passengers.get(p.id) or p.serialize() for p in self.passengers],
             "type": self.type,
             "y": self.y,
             "speed": self.get_speed(),
@@ -160,7 +234,7 @@ class Elevator(object):
             self.floor = dest_floor
             self.y = dest_floor
 
-            self.state = self.ELEVATOR_STATE['opening']
+            self.state = self.OPENING
             return
 
         if self.y > dest_floor:
@@ -193,7 +267,7 @@ class Elevator(object):
         self.y += kwargs.get('y', 0) * self.get_speed(with_weight=with_weight)
 
     def is_moving(self):
-        return self.state == self.ELEVATOR_STATE['moving']
+        return self.state == self.MOVING
 
     def is_filling(self):
-        return self.state == self.ELEVATOR_STATE['filling']
+        return self.state == self.FILLING
@@ -1,20 +1,47 @@
+# coding=utf-8
 from core import settings
 from core.utils import sign
 
 
 class Passenger(object):
+    WAITING_FOR_ELEVATOR = 1
+    MOVING_TO_ELEVATOR = 2
+    RETURNING = 3
+    MOVING_TO_FLOOR = 4
+    USING_ELEVATOR = 5
+    EXITING = 6
+    AWAY = 7
+    WALKING_ON_FLOOR = 8
+    FOR_DELETE = 9
+
     PASSENGER_STATE = {
-        'waiting_for_elevator': 1,
-        'moving_to_elevator': 2,
-        'returning': 3,
-        'moving_to_floor': 4,
-        'using_elevator': 5,
-        'exiting': 6,
-        'away': 7,
-        'walking_on_floor': 8,
-        'for_delete': 9,
+        'waiting_for_elevator': WAITING_FOR_ELEVATOR,
+        'moving_to_elevator': MOVING_TO_ELEVATOR,
+        'returning': RETURNING,
+        'moving_to_floor': MOVING_TO_FLOOR,
+        'using_elevator': USING_ELEVATOR,
+        'exiting': EXITING,
+        'away': AWAY,
+        'walking_on_floor': WALKING_ON_FLOOR,
+        'for_delete': FOR_DELETE,
     }
 
+    # Общие для всех пассажиров константы живут в классе, а не в каждом экземпляре
+    reward = settings.PASSENGERS['REWARD']
+    speed = settings.PASSENGERS['SPEED']['HORIZONTAL']
+    enemy_reward = settings.PASSENGERS['ENEMY_REWARD']
+    up_step = 1. / settings.PASSENGERS['SPEED']['UP']
+    down_step = -1. / settings.PASSENGERS['SPEED']['DOWN']
+    first_player = settings.PLAYERS['FIRST_PLAYER_KEY']
+    # Меньше этого от входа в лифт до награды не пройдет: двери закрываются,
+    # лифт проезжает хотя бы этаж и открывает двери
+    score_delay = (settings.ELEVATORS['CLOSING_TICKS'] + settings.ELEVATORS['TICKS_PER_FLOOR'] +
+                   settings.ELEVATORS['OPENING_TICKS'])
+
+    __slots__ = ('id', 'x', 'y', 'floor', 'from_floor', 'floors_queue', 'weight', 'type',
+                 'walking_time', 'time_to_away', 'move_to_floor',
+                 'elevator', 'reward_ready', 'dest_floor', 'state', 'time_to_floor')
+
     def __init__(self, id, x, y, floors_queue, weight, type):
         self.id = id
         self.x = x
@@ -25,11 +52,6 @@ class Passenger(object):
         self.weight = weight
         self.type = type
 
-        self.base_x = x
-
-        self.reward = settings.PASSENGERS['REWARD']
-        self.speed = settings.PASSENGERS['SPEED']['HORIZONTAL']
-        self.enemy_reward = settings.PASSENGERS['ENEMY_REWARD']
         self.walking_time = settings.PASSENGERS['WALKING_TIME']
         self.time_to_away = settings.PASSENGERS['TIME_TO_AWAY']
         self.move_to_floor = settings.PASSENGERS['MOVE_TO_FLOOR']
@@ -37,11 +59,11 @@ class Passenger(object):
         self.elevator = None
         self.reward_ready = False
         self.dest_floor = self.floors_queue.pop(0)
-        self.state = self.PASSENGER_STATE['waiting_for_elevator']
+        self.state = self.WAITING_FOR_ELEVATOR
         self.time_to_floor = 0
 
     def get_base_x(self):
-        if self.type == settings.PLAYERS['FIRST_PLAYER_KEY']:
+        if self.type == self.first_player:
             return -settings.BUILDING['PASSENGER_SPAWN_POSITION']
         return settings.BUILDING['PASSENGER_SPAWN_POSITION']
 
@@ -52,26 +74,26 @@ class Passenger(object):
         return self.elevator.get_type()
 
     def move_in_elevator(self):
-        if self.is_using_elevator():
+        if self.state == self.USING_ELEVATOR:
             self.y = self.elevator.y
 
     def is_waiting_for_elevator(self):
-        return self.state == self.PASSENGER_STATE['waiting_for_elevator']
+        return self.state == self.WAITING_FOR_ELEVATOR
 
     def is_returning(self):
-        return self.state == self.PASSENGER_STATE['returning']
+        return self.state == self.RETURNING
 
     def is_walking_on_floor(self):
-        return self.state == self.PASSENGER_STATE['walking_on_floor']
+        return self.state == self.WALKING_ON_FLOOR
 
     def is_reward_ready(self):
         return self.reward_ready
 
     def is_using_elevator(self):
-        return self.state == self.PASSENGER_STATE['using_elevator']
+        return self.state == self.USING_ELEVATOR
 
     def is_for_delete(self):
-        return self.state == self.PASSENGER_STATE['for_delete']
+        return self.state == self.FOR_DELETE
 
     def get_player_to_score(self):
         if self.elevator:
@@ -103,25 +125,38 @@ class Passenger(object):
         }
 
     def delete(self):
-        self.state = self.PASSENGER_STATE['for_delete']
+        self.state = self.FOR_DELETE
+
+    def can_score(self, ticks_left=None):
+        # Может ли пассажир еще принести очки за ticks_left тиков (None - без ограничения).
+        # Время берется с запасом вниз: путь до лифта и ожидание лифта не считаются,
+        # а лифт с пассажиром будто едет прямо к его этажу
+        state = self.state
+        if state == self.FOR_DELETE:
+            return False
+        if state == self.USING_ELEVATOR:
+            return ticks_left is None or self.elevator.ticks_to_floor(self.dest_floor) < ticks_left
+        ticks = self.score_delay
+        if state == self.WALKING_ON_FLOOR:
+            ticks += self.walking_time
+        elif state == self.MOVING_TO_FLOOR or state == self.EXITING:
+            # С пустой очередью этажей пассажир дойдет до цели и удалится
+            if not self.floors_queue:
+                return False
+            ticks += self.walking_time
+            ticks += self.time_to_floor if state == self.MOVING_TO_FLOOR else self.move_to_floor
+        return ticks_left is None or ticks < ticks_left
 
     def may_go_to_ladder(self):
-        if self.state in (
-            self.PASSENGER_STATE['waiting_for_elevator'],
-            self.PASSENGER_STATE['moving_to_elevator'],
-            self.PASSENGER_STATE['returning'],
-        ):
-            return True
-        else:
-            return False
+        return self.state <= self.RETURNING
 
     def go_to_ladder(self):
         self.time_to_away = settings.PASSENGERS['TIME_TO_AWAY']
-        if self.type == settings.PLAYERS["FIRST_PLAYER_KEY"]:
+        if self.type == self.first_player:
             self.x = -settings.BUILDING['LADDER_POSITION']
         else:
             self.x = settings.BUILDING['LADDER_POSITION']
-        self.state = self.PASSENGER_STATE['moving_to_floor']
+        self.state = self.MOVING_TO_FLOOR
 
         if self.y < self.dest_floor:
             self.time_to_floor = abs(self.from_floor - self.dest_floor) * settings.PASSENGERS["SPEED"]["UP"]
@@ -129,100 +164,147 @@ class Passenger(object):
             self.time_to_floor = abs(self.from_floor - self.dest_floor) * settings.PASSENGERS["SPEED"]["DOWN"]
 
         if self.elevator:
-            if self in self.elevator.passengers:
-                self.elevator.passengers.remove(self)
+            self.elevator.leave(self)
             self.elevator = None
 
     def arrived_to_floor(self, dest_floor):
         if len(self.floors_queue) == 0:
-            self.state = self.PASSENGER_STATE['for_delete']
+            self.state = self.FOR_DELETE
             return
         self.y = dest_floor
         self.floor = dest_floor
         self.from_floor = self.floor
         self.dest_floor = self.floors_queue.pop(0)
-        self.state = self.PASSENGER_STATE['walking_on_floor']
+        self.state = self.WALKING_ON_FLOOR
         self.reward_ready = False
 
     def on_tick(self):
-        if self.time_to_away == 0 and self.may_go_to_ladder():
-            self.go_to_ladder()
-            return
-
-        if self.may_go_to_ladder():
+        state = self.state
+        # Состояния 1-3: ожидание, путь к лифту и возврат, из них пассажир уходит на лестницу
+        if state <= self.RETURNING:
+            if self.time_to_away == 0:
+                self.go_to_ladder()
+                return
             self.time_to_away -= 1
 
-        if self.state == self.PASSENGER_STATE['waiting_for_elevator']:
+        if state == self.WAITING_FOR_ELEVATOR:
             if self.elevator:
-                self.state = self.PASSENGER_STATE['moving_to_elevator']
+                self.state = self.MOVING_TO_ELEVATOR
             return
 
-        if self.state == self.PASSENGER_STATE['moving_to_elevator']:
-            if self.elevator.floor == self.floor and self.elevator.is_filling():
-                if abs(self.x - self.elevator.x) >= self.speed:
-                    self.move(x=sign(self.elevator.x))
-                elif self.elevator.floor == self.from_floor and self.elevator.can_enter():
-                    self.elevator.enter(self)
-                    self.state = self.PASSENGER_STATE['using_elevator']
+        if state == self.MOVING_TO_ELEVATOR:
+            elevator = self.elevator
+            if elevator.floor == self.floor and elevator.is_filling():
+                if abs(self.x - elevator.x) >= self.speed:
+                    self.x += sign(elevator.x) * self.speed
+                elif elevator.floor == self.from_floor and elevator.can_enter():
+                    elevator.enter(self)
+                    self.state = self.USING_ELEVATOR
                 else:
                     self.elevator = None
-                    self.state = self.PASSENGER_STATE['returning']
+                    self.state = self.RETURNING
             else:
                 self.elevator = None
-                self.state = self.PASSENGER_STATE['returning']
+                self.state = self.RETURNING
             return
 
-        if self.state == self.PASSENGER_STATE['moving_to_floor']:
+        if state == self.MOVING_TO_FLOOR:
             dest_floor = self.dest_floor
             if self.y < dest_floor:
-                self.move(y=1. / settings.PASSENGERS["SPEED"]["UP"])
+                self.y += self.up_step
             elif self.y > dest_floor:
-                self.move(y=-1. / settings.PASSENGERS["SPEED"]["DOWN"])
+                self.y += self.down_step
             self.time_to_floor -= 1
 
             if self.time_to_floor == 0:
                 self.arrived_to_floor(dest_floor)
             return
 
-        if self.state == self.PASSENGER_STATE['returning']:
+        if state == self.RETURNING:
             if self.elevator:
-                self.state = self.PASSENGER_STATE['moving_to_elevator']
+                self.state = self.MOVING_TO_ELEVATOR
             base_x = self.get_base_x()
             if abs(base_x - self.x) > self.speed:
-                self.move(x=-sign(self.x - base_x))
+                self.x += -sign(self.x - base_x) * self.speed
             else:
                 self.x = base_x
-                self.state = self.PASSENGER_STATE['waiting_for_elevator']
+                self.state = self.WAITING_FOR_ELEVATOR
             return
 
-        if self.state == self.PASSENGER_STATE['using_elevator']:
+        if state == self.USING_ELEVATOR:
             return
 
-        if self.state == self.PASSENGER_STATE['exiting']:
+        if state == self.EXITING:
             self.move_to_floor -= 1
             if self.move_to_floor == 0:
                 self.move_to_floor = settings.PASSENGERS['MOVE_TO_FLOOR']
                 if self.floor == 0 or len(self.floors_queue) == 0:
-                    self.state = self.PASSENGER_STATE['for_delete']
+                    self.state = self.FOR_DELETE
                     return
-                self.state = self.PASSENGER_STATE['walking_on_floor']
+                self.state = self.WALKING_ON_FLOOR
                 self.from_floor = self.floor
                 self.dest_floor = self.floors_queue.pop(0)
                 return
 
-            self.move(x=sign(self.x))
+            self.x += sign(self.x) * self.speed
             return
 
-        if self.state == self.PASSENGER_STATE['walking_on_floor']:
+        if state == self.WALKING_ON_FLOOR:
             if self.walking_time == 0:
                 self.walking_time = settings.PASSENGERS['WALKING_TIME']
-                self.state = self.PASSENGER_STATE['waiting_for_elevator']
+                self.state = self.WAITING_FOR_ELEVATOR
                 self.time_to_away = settings.PASSENGERS['TIME_TO_AWAY']
                 self.x = self.get_base_x()
                 return
             self.walking_time -= 1
             return
 
+    def idle_ticks(self, limit):
+        # Сколько следующих тиков пассажир только досчитывает таймер, не меняя состояния
+        state = self.state
+        if state == self.USING_ELEVATOR:
+            return limit
+        if state == self.WALKING_ON_FLOOR:
+            return min(limit, self.walking_time)
+        if state == self.MOVING_TO_FLOOR:
+            return min(limit, self.time_to_floor - 1)
+        if state == self.EXITING:
+            return min(limit, self.move_to_floor - 1)
+        if self.elevator:
+            return 0
+        if state == self.WAITING_FOR_ELEVATOR:
+            return min(limit, self.time_to_away)
+        if state == self.RETURNING:
+            steps = max(0, (abs(self.get_base_x() - self.x) - 1) // self.speed)
+            return min(limit, self.time_to_away, steps)
+        return 0
+
+    def skip(self, ticks):
+        # Счетчики сдвигаются сразу, координаты прибавляются по тику, как в on_tick,
+        # чтобы float совпадал до бита
+        state = self.state
+        if state == self.WAITING_FOR_ELEVATOR:
+            self.time_to_away -= ticks
+        elif state == self.RETURNING:
+            self.time_to_away -= ticks
+            base_x = self.get_base_x()
+            for _ in xrange(ticks):
+                self.x += -sign(self.x - base_x) * self.speed
+        elif state == self.MOVING_TO_FLOOR:
+            self.time_to_floor -= ticks
+            dest_floor = self.dest_floor
+            for _ in xrange(ticks):
+                if self.y < dest_floor:
+                    self.y += self.up_step
+                elif self.y > dest_floor:
+                    self.y += self.down_step
+        elif state == self.EXITING:
+            self.move_to_floor -= ticks
+            for _ in xrange(ticks):
+                self.x += sign(self.x) * self.speed
+        elif state == self.WALKING_ON_FLOOR:
+            self.walking_time -= ticks
+
     def determine_score(self):
         self.reward_ready = False
         diff = abs(self.dest_floor - self.from_floor)
@@ -235,7 +317,7 @@ class Passenger(object):
 
     def exit(self, floor):
         self.reward_ready = True
-        self.state = self.PASSENGER_STATE['exiting']
+        self.state = self.EXITING
         self.floor = floor
         self.y = floor
 
@@ -0,0 +1,782 @@
+# coding=utf-8
+import numpy as np
+
+from core import settings
+from core.game_objects.elevator import Elevator
+from core.game_objects.passenger import Passenger
+
+ELEVATOR_STATE = Elevator.ELEVATOR_STATE
+PASSENGER_STATE = Passenger.PASSENGER_STATE
+
+PLAYER_TYPES = (settings.PLAYERS['FIRST_PLAYER_KEY'], settings.PLAYERS['SECOND_PLAYER_KEY'])
+FIRST_PLAYER = 0
+
+PASSENGER_FIELDS = (
+    ('p_id', np.int64), ('p_x', np.int64), ('p_y', np.float64), ('p_y_int', np.bool_),
+    ('p_floor', np.int64), ('p_from', np.int64), ('p_dest', np.int64), ('p_weight', np.float64),
+    ('p_type', np.int8), ('p_state', np.int8), ('p_elevator', np.int64), ('p_time_to_away', np.int64),
+    ('p_walking_time', np.int64), ('p_move_to_floor', np.int64), ('p_time_to_floor', np.int64),
+    ('p_reward_ready', np.bool_), ('p_alive', np.bool_),
+)
+
+
+class Scalars(object):
+    # Поля из массивов как списки python, по одному списку на поле по первому
+    # обращению. Чтение элемента списка во много раз быстрее, чем элемента массива
+    # numpy, а команды, сериализация и кадр визуализатора читают поштучно.
+    # Годится до следующего изменения массивов, VectorBuilding сбрасывает его
+    # в on_tick, skip и add_passenger
+    def __init__(self, building):
+        self.building = building
+
+    def __getattr__(self, name):
+        values = getattr(self.building, name)
+        if name.startswith('p_'):
+            values = values[:self.building.size]
+        values = values.tolist()
+        setattr(self, name, values)
+        return values
+
+    def set(self, name, index, value):
+        # Запись в массив и в уже построенный список
+        getattr(self.building, name)[index] = value
+        values = self.__dict__.get(name)
+        if values is not None:
+            values[index] = value
+
+
+def signs(values):
+    return np.where(values < 0, -1, 1)
+
+
+def y_value(y, is_int):
+    if is_int:
+        return int(y)
+    return float(y)
+
+
+class VectorElevator(object):
+    def __init__(self, building, index):
+        self.building = building
+        self.index = index
+        self.id = int(building.e_id[index])
+        self.x = int(building.e_x[index])
+        self.type = PLAYER_TYPES[building.e_type[index]]
+
+    def get_type(self):
+        return self.type
+
+    def go_to_floor(self, floor):
+        # Стратегии повторяют одну и ту же команду каждый тик, пишется только новый этаж
+        s = self.building.scalars()
+        index = self.index
+        if s.e_next_floor[index] == floor or s.e_state[index] == ELEVATOR_STATE['moving']:
+            return
+        if 0 < floor <= self.building.floors_count:
+            self.building.e_next_floor[index] = floor
+            s.e_next_floor[index] = floor
+
+    def serialize(self, passengers=None):
+        return self.building.serialize_elevator(self.index, passengers)
+
+    def get_visio(self):
+        s = self.building.scalars()
+        return {
+            "x": self.x,
+            "y": y_value(s.e_y[self.index], s.e_y_int[self.index]),
+            "state": s.e_state[self.index],
+            "type": self.type
+        }
+
+
+class VectorPassenger(object):
+    def __init__(self, building, slot, id):
+        self.building = building
+        self.slot = slot
+        self.id = id
+
+    @property
+    def type(self):
+        return PLAYER_TYPES[self.building.scalars().p_type[self.slot]]
+
+    @property
+    def floor(self):
+        return self.building.scalars().p_floor[self.slot]
+
+    def get_type(self):
+        return self.type
+
+    def is_walking_on_floor(self):
+        return self.building.scalars().p_state[self.slot] == PASSENGER_STATE['walking_on_floor']
+
+    def serialize(self):
+        return self.building.serialize_passenger(self.slot)
+
+    def get_visio(self):
+        s = self.building.scalars()
+        slot = self.slot
+        return {
+            "x": s.p_x[slot],
+            "y": y_value(s.p_y[slot], s.p_y_int[slot]),
+            "type": PLAYER_TYPES[s.p_type[slot]],
+            "state": s.p_state[slot],
+            "id": self.id,
+            "time_to_away": s.p_time_to_away[slot],
+        }
+
+
+class VectorBuilding(object):
+    # Тот же Building, но состояние лифтов и пассажиров хранится в массивах numpy
+    # (по массиву на поле), и каждый тик все сущности в одном состоянии
+    # обновляются разом. Поштучно, в порядке id, обрабатываются только
+    # взаимодействия, где важен порядок: вход в лифт, очередь этажей и награда.
+    # Снаружи здания видны VectorElevator/VectorPassenger с тем же интерфейсом,
+    # что у Elevator/Passenger для World и API
+    def __init__(self, rng):
+        self.rng = rng
+        self.floors_count = settings.BUILDING['FLOORS_COUNT']
+        self.players_score = {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: 0,
+            settings.PLAYERS['SECOND_PLAYER_KEY']: 0
+        }
+
+        ids, xs, types = [], [], []
+        elevator_id = 1
+        for i in range(settings.BUILDING['ELEVATORS_FOR_PASSENGER_COUNT']):
+            elevator_x = settings.BUILDING['FIRST_ELEVATOR_POSITION'] + i * (settings.BUILDING['ELEVATOR_IN_GROUP_OFFSET'])
+            for type_index, x in ((0, -elevator_x), (1, elevator_x)):
+                ids.append(elevator_id)
+                xs.append(x)
+                types.append(type_index)
+                elevator_id += 1
+
+        count = len(ids)
+        self.e_id = np.array(ids, dtype=np.int64)
+        self.e_x = np.array(xs, dtype=np.int64)
+        self.e_type = np.array(types, dtype=np.int8)
+        self.e_y = np.full(count, settings.BUILDING['FIRST_FLOOR'], dtype=np.float64)
+        self.e_y_int = np.ones(count, dtype=np.bool_)
+        self.e_floor = np.full(count, settings.BUILDING['FIRST_FLOOR'], dtype=np.int64)
+        self.e_next_floor = np.full(count, -1, dtype=np.int64)
+        self.e_state = np.full(count, ELEVATOR_STATE['filling'], dtype=np.int8)
+        self.e_time_to_floor = np.zeros(count, dtype=np.float64)
+        self.e_time_on_floor = np.zeros(count, dtype=np.int64)
+        self.e_time_opened = np.zeros(count, dtype=np.int64)
+        self.e_opening_ticks = np.full(count, settings.ELEVATORS['OPENING_TICKS'], dtype=np.int64)
+        self.e_closing_ticks = np.full(count, settings.ELEVATORS['CLOSING_TICKS'], dtype=np.int64)
+        self.e_filling_delay = np.full(count, settings.ELEVATORS['FILLING_DELAY'], dtype=np.int64)
+        # Порядок пассажиров в лифте и произведение их весов считаются как в
+        # Elevator.get_speed, иначе скорость разойдется в последних битах
+        self.e_passengers = [[] for _ in range(count)]
+        self.e_load = [1] * count
+
+        self.elevators = [VectorElevator(self, i) for i in range(count)]
+        self.players_elevators = {
+            player: [e for e in self.elevators if e.type == player] for player in PLAYER_TYPES
+        }
+        self.players_elevators_by_id = {k: {e.id: e for e in v} for k, v in self.players_elevators.iteritems()}
+        self.players_elevator_indexes = {k: [e.index for e in v] for k, v in self.players_elevators.iteritems()}
+
+        self.size = 0
+        self.capacity = 0
+        for name, dtype in PASSENGER_FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.p_views = []
+        self.p_floors_queue = []
+        self.passengers_by_id = {}
+        self.passenger_id = 1
+        self.cache = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['cache'] = None
+        return state
+
+    def scalars(self):
+        if self.cache is None:
+            self.cache = Scalars(self)
+        return self.cache
+
+    def get_score_for(self, player):
+        return self.players_score[player]
+
+    def get_player_elevator(self, player):
+        return self.players_elevators.get(player)
+
+    def get_player_elevator_by_id(self, player, elevator_id):
+        return self.players_elevators_by_id[player].get(elevator_id)
+
+    def get_passengers(self):
+        return [self.p_views[i] for i in np.flatnonzero(self.p_alive[:self.size])]
+
+    def get_player_passengers(self, player):
+        mask = self.p_alive[:self.size] & (self.p_type[:self.size] == PLAYER_TYPES.index(player))
+        return [self.p_views[i] for i in np.flatnonzero(mask)]
+
+    def get_passengers_in_state(self, player, state):
+        n = self.size
+        mask = self.p_alive[:n] & (self.p_type[:n] == PLAYER_TYPES.index(player)) & (self.p_state[:n] == state)
+        return [self.p_views[i] for i in np.flatnonzero(mask)]
+
+    def get_passenger_by_id(self, passenger_id):
+        return self.passengers_by_id.get(passenger_id)
+
+    def get_waiting_passengers(self, player):
+        # Building ведет счетчики по этажам, здесь их заменяет один bincount по массивам
+        n = self.size
+        mask = (self.p_alive[:n] & (self.p_type[:n] == PLAYER_TYPES.index(player)) &
+                (self.p_state[:n] == PASSENGER_STATE['walking_on_floor']))
+        counts = np.bincount(self.p_floor[:n][mask])
+        return {int(floor): int(count) for floor, count in enumerate(counts) if count}
+
+    def get_speed(self, index, with_weight=True):
+        speed = 1. / settings.ELEVATORS['TICKS_PER_FLOOR']
+        if not with_weight:
+            return speed
+        multiple = self.e_load[index]
+        if len(self.e_passengers[index]) > settings.ELEVATORS['SOFT_CAPACITY']:
+            multiple *= settings.ELEVATORS['OVERLOAD_MULTIPLY']
+        return speed / multiple
+
+    def update_load(self, index):
+        load = 1
+        for slot in self.e_passengers[index]:
+            load *= float(self.p_weight[slot])
+        self.e_load[index] = load
+
+    def is_elevator_full(self, index):
+        return len(self.e_passengers[index]) == settings.ELEVATORS['CRITICAL_CAPACITY']
+
+    def set_passenger_elevator(self, passenger, elevator):
+        s = self.scalars()
+        slot = passenger.slot
+        index = elevator.index
+        state = s.p_state[slot]
+        if state != PASSENGER_STATE['waiting_for_elevator'] and state != PASSENGER_STATE['returning']:
+            return
+        if s.e_floor[index] != s.p_from[slot] or s.e_state[index] != ELEVATOR_STATE['filling'] or self.is_elevator_full(index):
+            return
+
+        current = s.p_elevator[slot]
+        if current != -1:
+            x = s.p_x[slot]
+            if abs(x - s.e_x[index]) < abs(x - s.e_x[current]):
+                s.set('p_elevator', slot, index)
+            return
+
+        if s.e_type[index] == s.p_type[slot]:
+            s.set('p_elevator', slot, index)
+            return
+
+        if s.e_time_opened[index] >= settings.ELEVATORS['TIME_ON_THE_FLOOR_TO_LOAD_ENEMY_PASSENGER']:
+            s.set('p_elevator', slot, index)
+
+    def grow(self):
+        self.capacity = max(64, self.capacity * 2)
+        for name, dtype in PASSENGER_FIELDS:
+            values = np.zeros(self.capacity, dtype=dtype)
+            values[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, values)
+
+    def compact(self):
+        alive = np.flatnonzero(self.p_alive[:self.size])
+        remap = np.full(self.size, -1, dtype=np.int64)
+        remap[alive] = np.arange(len(alive))
+        for name, _ in PASSENGER_FIELDS:
+            values = getattr(self, name)
+            values[:len(alive)] = values[alive]
+        self.p_alive[len(alive):] = False
+        self.p_views = [self.p_views[i] for i in alive]
+        self.p_floors_queue = [self.p_floors_queue[i] for i in alive]
+        for slot, view in enumerate(self.p_views):
+            view.slot = slot
+        self.e_passengers = [[int(remap[s]) for s in slots] for slots in self.e_passengers]
+        self.size = len(alive)
+
+    def add_passenger(self, x, floors_queue, weight, type_index):
+        self.cache = None
+        if self.size == self.capacity:
+            self.grow()
+        slot = self.size
+        self.size += 1
+
+        floors_queue = list(floors_queue)
+        floor = settings.BUILDING['FIRST_FLOOR']
+        self.p_id[slot] = self.passenger_id
+        self.p_x[slot] = x
+        self.p_y[slot] = floor
+        self.p_y_int[slot] = True
+        self.p_floor[slot] = floor
+        self.p_from[slot] = floor
+        self.p_dest[slot] = floors_queue.pop(0)
+        self.p_weight[slot] = weight
+        self.p_type[slot] = type_index
+        self.p_state[slot] = PASSENGER_STATE['waiting_for_elevator']
+        self.p_elevator[slot] = -1
+        self.p_time_to_away[slot] = settings.PASSENGERS['TIME_TO_AWAY']
+        self.p_walking_time[slot] = settings.PASSENGERS['WALKING_TIME']
+        self.p_move_to_floor[slot] = settings.PASSENGERS['MOVE_TO_FLOOR']
+        self.p_time_to_floor[slot] = 0
+        self.p_reward_ready[slot] = False
+        self.p_alive[slot] = True
+
+        view = VectorPassenger(self, slot, self.passenger_id)
+        self.p_views.append(view)
+        self.p_floors_queue.append(floors_queue)
+        self.passengers_by_id[self.passenger_id] = view
+        self.passenger_id += 1
+
+    def spawn(self):
+        floors_queue = self.rng.sample(range(2, settings.BUILDING['FLOORS_COUNT'] + 1),
+                                       settings.BUILDING['FLOORS_QUEUE_LEN'](self.rng)) + [settings.BUILDING["FIRST_FLOOR"]]
+        weight = settings.PASSENGERS['WEIGHT'](self.rng)
+
+        passenger_x = settings.BUILDING['PASSENGER_SPAWN_POSITION']
+        self.add_passenger(-passenger_x, floors_queue, weight, 0)
+        self.add_passenger(passenger_x, floors_queue, weight, 1)
+
+    def serialize_passenger(self, slot):
+        s = self.scalars()
+        elevator = s.p_elevator[slot]
+        return {
+            "state": s.p_state[slot],
+            "id": s.p_id[slot],
+            "x": s.p_x[slot],
+            "y": y_value(s.p_y[slot], s.p_y_int[slot]),
+            "time_to_away": s.p_time_to_away[slot],
+            "weight": s.p_weight[slot],
+            "type": PLAYER_TYPES[s.p_type[slot]],
+            "dest_floor": s.p_dest[slot],
+            "from_floor": s.p_from[slot],
+            "floor": s.p_floor[slot],
+            "elevator": s.e_id[elevator] if elevator != -1 else None
+        }
+
+    def serialize_visible_passengers(self, player):
+        # То же, что serialize_passenger для каждого видимого пассажира игрока,
+        # но поля выбираются из массивов разом, а словари собираются из списков
+        n = self.size
+        slots = np.flatnonzero(self.p_alive[:n] & (self.p_type[:n] == PLAYER_TYPES.index(player)) &
+                               (self.p_state[:n] != PASSENGER_STATE['walking_on_floor']))
+        if not len(slots):
+            return []
+        elevator = self.p_elevator[slots]
+        elevator_ids = [e if e else None for e in np.where(elevator != -1, self.e_id[elevator], 0).tolist()]
+        ys = [int(y) if is_int else y for y, is_int in zip(self.p_y[slots].tolist(), self.p_y_int[slots].tolist())]
+        return [{
+            "state": state,
+            "id": id,
+            "x": x,
+            "y": y,
+            "time_to_away": time_to_away,
+            "weight": weight,
+            "type": player,
+            "dest_floor": dest_floor,
+            "from_floor": from_floor,
+            "floor": floor,
+            "elevator": elevator_id
+        } for state, id, x, y, time_to_away, weight, dest_floor, from_floor, floor, elevator_id in zip(
+            self.p_state[slots].tolist(), self.p_id[slots].tolist(), self.p_x[slots].tolist(), ys,
+            self.p_time_to_away[slots].tolist(), self.p_weight[slots].tolist(), self.p_dest[slots].tolist(),
+            self.p_from[slots].tolist(), self.p_floor[slots].tolist(), elevator_ids)]
+
+    def serialize_elevators(self, player, passengers):
+        # То же, что serialize_elevator для лифтов игрока, из списков Scalars
+        s = self.scalars()
+        return [{
+            "id": s.e_id[index],
+            "state": s.e_state[index],
+            "floor": s.e_floor[index],
+            "passengers": [passengers.get(s.p_id[slot]) or self.serialize_passenger(slot)
+                           for slot in self.e_passengers[index]],
+            "type": player,
+            "y": y_value(s.e_y[index], s.e_y_int[index]),
+            "speed": self.get_speed(index),
+            "next_floor": s.e_next_floor[index],
+            "time_on_floor": s.e_time_on_floor[index]
+        } for index in self.players_elevator_indexes[player]]
+
+    def serialize_elevator(self, index, passengers=None):
+        s = self.scalars()
+        passengers = passengers or {}
+        return {
+            "id": s.e_id[index],
+            "state": s.e_state[index],
+            "floor": s.e_floor[index],
+            "passengers": [passengers.get(s.p_id[slot]) or self.serialize_passenger(slot)
+                           for slot in self.e_passengers[index]],
+            "type": PLAYER_TYPES[s.e_type[index]],
+            "y": y_value(s.e_y[index], s.e_y_int[index]),
+            "speed": self.get_speed(index),
+            "next_floor": s.e_next_floor[index],
+            "time_on_floor": s.e_time_on_floor[index]
+        }
+
+    def can_score(self, ticks_left=None):
+        # То же, что Passenger.can_score по всем пассажирам, над массивами
+        n = self.size
+        state = self.p_state[:n]
+        walking = state == PASSENGER_STATE['walking_on_floor']
+        ladder = state == PASSENGER_STATE['moving_to_floor']
+        exiting = state == PASSENGER_STATE['exiting']
+        leaving = ladder | exiting
+        candidates = self.p_alive[:n] & (state != PASSENGER_STATE['for_delete'])
+        if ticks_left is not None:
+            ticks = np.full(n, Passenger.score_delay, dtype=np.float64)
+            ticks += np.where(walking | leaving, self.p_walking_time[:n], 0)
+            ticks += np.where(ladder, self.p_time_to_floor[:n], 0)
+            ticks += np.where(exiting, self.p_move_to_floor[:n], 0)
+            riders = np.flatnonzero(state == PASSENGER_STATE['using_elevator'])
+            ticks[riders] = self.ticks_to_floor(self.p_elevator[riders], self.p_dest[riders])
+            candidates &= ticks < ticks_left
+        if (candidates & ~leaving).any():
+            return True
+        return any(self.p_floors_queue[slot] for slot in np.flatnonzero(candidates & leaving))
+
+    def ticks_to_floor(self, index, floor):
+        # То же, что Elevator.ticks_to_floor для лифтов index и этажей floor
+        state = self.e_state[index]
+        moving = state == ELEVATOR_STATE['moving']
+        opening = state == ELEVATOR_STATE['opening']
+        filling = state == ELEVATOR_STATE['filling']
+        closing = state == ELEVATOR_STATE['closing']
+        at = np.where(moving, self.e_next_floor[index], self.e_floor[index])
+        ticks = np.abs(at - floor) * settings.ELEVATORS['TICKS_PER_FLOOR'] + settings.ELEVATORS['OPENING_TICKS']
+        ticks = ticks + np.where(moving, self.e_time_to_floor[index], 0)
+        ticks += np.where(closing, self.e_closing_ticks[index], 0)
+        ticks += np.where(opening, self.e_opening_ticks[index], 0)
+        ticks += np.where(opening | filling, settings.ELEVATORS['CLOSING_TICKS'], 0)
+        arrived = ~moving & (at == floor)
+        ticks[arrived & filling] = 0
+        ticks[arrived & opening] = self.e_opening_ticks[index][arrived & opening]
+        return ticks
+
+    def idle_ticks(self, limit):
+        # То же, что Building.idle_ticks, над массивами
+        if not (self.e_state == ELEVATOR_STATE['moving']).all():
+            return 0
+        limit = min(limit, int(np.ceil(self.e_time_to_floor).min()) - 1)
+        if limit <= 0:
+            return 0
+
+        n = self.size
+        alive = self.p_alive[:n]
+        if not alive.any():
+            return limit
+        state = self.p_state[:n]
+        free = self.p_elevator[:n] == -1
+        base_x = np.where(self.p_type[:n] == FIRST_PLAYER, -1, 1) * settings.BUILDING['PASSENGER_SPAWN_POSITION']
+        steps = np.maximum((np.abs(base_x - self.p_x[:n]) - 1) // settings.PASSENGERS['SPEED']['HORIZONTAL'], 0)
+        ticks = np.select([
+            state == PASSENGER_STATE['using_elevator'],
+            state == PASSENGER_STATE['walking_on_floor'],
+            state == PASSENGER_STATE['moving_to_floor'],
+            state == PASSENGER_STATE['exiting'],
+            (state == PASSENGER_STATE['waiting_for_elevator']) & free,
+            (state == PASSENGER_STATE['returning']) & free,
+        ], [
+            limit,
+            self.p_walking_time[:n],
+            self.p_time_to_floor[:n] - 1,
+            self.p_move_to_floor[:n] - 1,
+            self.p_time_to_away[:n],
+            np.minimum(self.p_time_to_away[:n], steps),
+        ], 0)
+        return max(0, min(limit, int(ticks[alive].min())))
+
+    def skip(self, ticks):
+        self.cache = None
+        moving = self.e_state == ELEVATOR_STATE['moving']
+        self.e_time_opened[:] = 0
+        for _ in xrange(ticks):
+            self.elevators_move(moving)
+
+        n = self.size
+        alive = self.p_alive[:n]
+        state = self.p_state[:n]
+        x = self.p_x[:n]
+        y = self.p_y[:n]
+        speed = settings.PASSENGERS['SPEED']['HORIZONTAL']
+
+        waiting = alive & ((state == PASSENGER_STATE['waiting_for_elevator']) | (state == PASSENGER_STATE['returning']))
+        self.p_time_to_away[:n][waiting] -= ticks
+        walking = alive & (state == PASSENGER_STATE['walking_on_floor'])
+        self.p_walking_time[:n][walking] -= ticks
+
+        returning = alive & (state == PASSENGER_STATE['returning'])
+        if returning.any():
+            base_x = np.where(self.p_type[:n] == FIRST_PLAYER, -1, 1) * settings.BUILDING['PASSENGER_SPAWN_POSITION']
+            for _ in xrange(ticks):
+                x[returning] += -signs(x - base_x)[returning] * speed
+
+        moving_to_floor = alive & (state == PASSENGER_STATE['moving_to_floor'])
+        if moving_to_floor.any():
+            self.p_time_to_floor[:n][moving_to_floor] -= ticks
+            dest = self.p_dest[:n]
+            for _ in xrange(ticks):
+                up = moving_to_floor & (y < dest)
+                down = moving_to_floor & (y > dest)
+                y[up] += 1. / settings.PASSENGERS["SPEED"]["UP"]
+                y[down] += -1. / settings.PASSENGERS["SPEED"]["DOWN"]
+                self.p_y_int[:n][up | down] = False
+
+        exiting = alive & (state == PASSENGER_STATE['exiting'])
+        if exiting.any():
+            self.p_move_to_floor[:n][exiting] -= ticks
+            for _ in xrange(ticks):
+                x[exiting] += signs(x)[exiting] * speed
+
+    def on_tick(self):
+        self.cache = None
+        self.elevators_tick()
+        self.passengers_tick()
+
+        dead = self.size - np.count_nonzero(self.p_alive[:self.size])
+        if dead > 64 and dead * 2 > self.size:
+            self.compact()
+
+    def elevators_tick(self):
+        state = self.e_state.copy()
+        moving = state == ELEVATOR_STATE['moving']
+        filling = state == ELEVATOR_STATE['filling']
+
+        self.e_time_on_floor[~moving] += 1
+        self.e_time_opened[filling] += 1
+        self.e_time_opened[~filling] = 0
+
+        waiting = (state == ELEVATOR_STATE['waiting']) & (self.e_next_floor != -1)
+        departing = waiting & (self.e_floor != self.e_next_floor)
+        self.e_state[waiting & ~departing] = ELEVATOR_STATE['opening']
+        self.e_state[departing] = ELEVATOR_STATE['moving']
+        for index in np.flatnonzero(departing):
+            distance = abs(self.e_floor[index] - self.e_next_floor[index])
+            if self.e_y[index] > self.e_next_floor[index]:
+                self.e_time_to_floor[index] = distance / self.get_speed(index, with_weight=False)
+            elif self.e_y[index] < self.e_next_floor[index]:
+                self.e_time_to_floor[index] = distance / self.get_speed(index)
+
+        if moving.any():
+            self.elevators_move(moving)
+
+        opening = state == ELEVATOR_STATE['opening']
+        self.e_opening_ticks[opening] -= 1
+        opened = opening & (self.e_opening_ticks == 0)
+        self.e_next_floor[opened] = -1
+        self.e_state[opened] = ELEVATOR_STATE['filling']
+        self.e_opening_ticks[opened] = settings.ELEVATORS['OPENING_TICKS']
+
+        if filling.any():
+            self.elevators_fill(filling)
+
+        closing = state == ELEVATOR_STATE['closing']
+        self.e_closing_ticks[closing] -= 1
+        closed = closing & (self.e_closing_ticks == 0)
+        self.e_state[closed] = ELEVATOR_STATE['waiting']
+        self.e_closing_ticks[closed] = settings.ELEVATORS['CLOSING_TICKS']
+
+    def elevators_move(self, moving):
+        self.e_time_on_floor[moving] = 0
+        self.e_time_to_floor[moving] -= 1
+
+        arrived = moving & (self.e_time_to_floor <= 0)
+        self.e_floor[arrived] = self.e_next_floor[arrived]
+        self.e_y[arrived] = self.e_next_floor[arrived]
+        self.e_y_int[arrived] = True
+        self.e_state[arrived] = ELEVATOR_STATE['opening']
+
+        moving = moving & ~arrived
+        down = moving & (self.e_y > self.e_next_floor)
+        up = moving & (self.e_y < self.e_next_floor)
+        speed = 1. / settings.ELEVATORS['TICKS_PER_FLOOR']
+        if down.any():
+            self.e_floor[down & (np.abs(self.e_floor + 1 - self.e_y) < speed)] -= 1
+            self.e_y[down] += -1 * speed
+        if up.any():
+            speeds = np.array([self.get_speed(i) for i in range(len(self.elevators))])
+            self.e_floor[up & (np.abs(self.e_y - (self.e_floor - 1)) < speeds)] += 1
+            self.e_y[up] += 1 * speeds[up]
+
+        moved = down | up
+        self.e_y_int[moved] = False
+        if not moved.any():
+            return
+        n = self.size
+        riders = self.p_alive[:n] & (self.p_state[:n] == PASSENGER_STATE['using_elevator'])
+        riders &= moved[np.maximum(self.p_elevator[:n], 0)]
+        elevators = self.p_elevator[:n][riders]
+        self.p_y[:n][riders] = self.e_y[elevators]
+        self.p_y_int[:n][riders] = False
+
+    def elevators_fill(self, filling):
+        self.e_filling_delay[filling] -= 1
+        can_close = filling & (self.e_filling_delay <= 0)
+
+        n = self.size
+        elevators = np.maximum(self.p_elevator[:n], 0)
+        exiting = self.p_alive[:n] & (self.p_state[:n] == PASSENGER_STATE['using_elevator'])
+        exiting &= filling[elevators] & (self.p_dest[:n] == self.e_floor[elevators])
+        if exiting.any():
+            slots = np.flatnonzero(exiting)
+            for index in np.unique(elevators[slots]):
+                self.e_passengers[index] = [s for s in self.e_passengers[index] if not exiting[s]]
+                self.update_load(index)
+                can_close[index] = False
+            self.p_reward_ready[slots] = True
+            self.p_state[slots] = PASSENGER_STATE['exiting']
+            self.p_floor[slots] = self.e_floor[elevators[slots]]
+            self.p_y[slots] = self.p_floor[slots]
+            self.p_y_int[slots] = True
+
+        closing = can_close & (self.e_next_floor != -1) & (self.e_next_floor != self.e_floor)
+        self.e_filling_delay[closing] = settings.ELEVATORS['FILLING_DELAY']
+        self.e_state[closing] = ELEVATOR_STATE['closing']
+
+    def passengers_tick(self):
+        n = self.size
+        if not n:
+            return
+        alive = self.p_alive[:n]
+        state = self.p_state[:n].copy()
+        x = self.p_x[:n]
+        y = self.p_y[:n]
+        y_int = self.p_y_int[:n]
+        elevator = self.p_elevator[:n]
+        time_to_away = self.p_time_to_away[:n]
+        base_x = np.where(self.p_type[:n] == FIRST_PLAYER, -1, 1) * settings.BUILDING['PASSENGER_SPAWN_POSITION']
+
+        may_go_to_ladder = alive & ((state == PASSENGER_STATE['waiting_for_elevator']) |
+                                    (state == PASSENGER_STATE['moving_to_elevator']) |
+                                    (state == PASSENGER_STATE['returning']))
+        to_ladder = may_go_to_ladder & (time_to_away == 0)
+        time_to_away[may_go_to_ladder & ~to_ladder] -= 1
+        if to_ladder.any():
+            self.passengers_go_to_ladder(to_ladder)
+
+        active = alive & ~to_ladder
+
+        waiting = active & (state == PASSENGER_STATE['waiting_for_elevator'])
+        self.p_state[:n][waiting & (elevator != -1)] = PASSENGER_STATE['moving_to_elevator']
+
+        moving_to_elevator = active & (state == PASSENGER_STATE['moving_to_elevator'])
+        if moving_to_elevator.any():
+            self.passengers_move_to_elevator(moving_to_elevator)
+
+        moving_to_floor = active & (state == PASSENGER_STATE['moving_to_floor'])
+        if moving_to_floor.any():
+            dest = self.p_dest[:n]
+            up = moving_to_floor & (y < dest)
+            down = moving_to_floor & (y > dest)
+            y[up] += 1. / settings.PASSENGERS["SPEED"]["UP"]
+            y[down] += -1. / settings.PASSENGERS["SPEED"]["DOWN"]
+            y_int[up | down] = False
+            self.p_time_to_floor[:n][moving_to_floor] -= 1
+            for slot in np.flatnonzero(moving_to_floor & (self.p_time_to_floor[:n] == 0)):
+                self.passenger_arrived_to_floor(slot)
+
+        returning = active & (state == PASSENGER_STATE['returning'])
+        if returning.any():
+            self.p_state[:n][returning & (elevator != -1)] = PASSENGER_STATE['moving_to_elevator']
+            far = returning & (np.abs(base_x - x) > settings.PASSENGERS['SPEED']['HORIZONTAL'])
+            x[far] += -signs(x - base_x)[far] * settings.PASSENGERS['SPEED']['HORIZONTAL']
+            back = returning & ~far
+            x[back] = base_x[back]
+            self.p_state[:n][back] = PASSENGER_STATE['waiting_for_elevator']
+
+        exiting = active & (state == PASSENGER_STATE['exiting'])
+        if exiting.any():
+            move_to_floor = self.p_move_to_floor[:n]
+            move_to_floor[exiting] -= 1
+            exited = exiting & (move_to_floor == 0)
+            move_to_floor[exited] = settings.PASSENGERS['MOVE_TO_FLOOR']
+            for slot in np.flatnonzero(exited):
+                if self.p_floor[slot] == 0 or not self.p_floors_queue[slot]:
+                    self.p_state[slot] = PASSENGER_STATE['for_delete']
+                    continue
+                self.p_state[slot] = PASSENGER_STATE['walking_on_floor']
+                self.p_from[slot] = self.p_floor[slot]
+                self.p_dest[slot] = self.p_floors_queue[slot].pop(0)
+            walking_out = exiting & ~exited
+            x[walking_out] += signs(x)[walking_out] * settings.PASSENGERS['SPEED']['HORIZONTAL']
+
+        walking = active & (state == PASSENGER_STATE['walking_on_floor'])
+        if walking.any():
+            walking_time = self.p_walking_time[:n]
+            walked = walking & (walking_time == 0)
+            walking_time[walking & ~walked] -= 1
+            walking_time[walked] = settings.PASSENGERS['WALKING_TIME']
+            self.p_state[:n][walked] = PASSENGER_STATE['waiting_for_elevator']
+            time_to_away[walked] = settings.PASSENGERS['TIME_TO_AWAY']
+            x[walked] = base_x[walked]
+
+        for slot in np.flatnonzero(self.p_reward_ready[:n]):
+            self.passenger_reward(slot)
+
+        for slot in np.flatnonzero(alive & (self.p_state[:n] == PASSENGER_STATE['for_delete'])):
+            self.p_alive[slot] = False
+            del self.passengers_by_id[self.p_views[slot].id]
+
+    def passengers_go_to_ladder(self, mask):
+        n = self.size
+        slots = np.flatnonzero(mask)
+        self.p_time_to_away[slots] = settings.PASSENGERS['TIME_TO_AWAY']
+        self.p_x[slots] = np.where(self.p_type[slots] == FIRST_PLAYER, -1, 1) * settings.BUILDING['LADDER_POSITION']
+        self.p_state[slots] = PASSENGER_STATE['moving_to_floor']
+        speed = np.where(self.p_y[slots] < self.p_dest[slots], settings.PASSENGERS["SPEED"]["UP"], settings.PASSENGERS["SPEED"]["DOWN"])
+        self.p_time_to_floor[slots] = np.abs(self.p_from[slots] - self.p_dest[slots]) * speed
+
+        for slot in slots[self.p_elevator[:n][slots] != -1]:
+            index = self.p_elevator[slot]
+            if slot in self.e_passengers[index]:
+                self.e_passengers[index].remove(slot)
+                self.update_load(index)
+        self.p_elevator[slots] = -1
+
+    def passengers_move_to_elevator(self, mask):
+        n = self.size
+        speed = settings.PASSENGERS['SPEED']['HORIZONTAL']
+        elevators = np.maximum(self.p_elevator[:n], 0)
+        elevator_floor = self.e_floor[elevators]
+        at_elevator = mask & (elevator_floor == self.p_floor[:n]) & (self.e_state[elevators] == ELEVATOR_STATE['filling'])
+        far = at_elevator & (np.abs(self.p_x[:n] - self.e_x[elevators]) >= speed)
+        self.p_x[:n][far] += signs(self.e_x[elevators])[far] * speed
+
+        entering = at_elevator & ~far & (elevator_floor == self.p_from[:n])
+        for slot in np.flatnonzero(entering):
+            index = elevators[slot]
+            if len(self.e_passengers[index]) < settings.ELEVATORS['CRITICAL_CAPACITY']:
+                self.e_passengers[index].append(slot)
+                self.e_load[index] *= float(self.p_weight[slot])
+                self.p_state[slot] = PASSENGER_STATE['using_elevator']
+            else:
+                self.p_elevator[slot] = -1
+                self.p_state[slot] = PASSENGER_STATE['returning']
+
+        rejected = mask & ~far & ~entering
+        self.p_elevator[:n][rejected] = -1
+        self.p_state[:n][rejected] = PASSENGER_STATE['returning']
+
+    def passenger_arrived_to_floor(self, slot):
+        if not self.p_floors_queue[slot]:
+            self.p_state[slot] = PASSENGER_STATE['for_delete']
+            return
+        dest_floor = self.p_dest[slot]
+        self.p_y[slot] = dest_floor
+        self.p_y_int[slot] = True
+        self.p_floor[slot] = dest_floor
+        self.p_from[slot] = dest_floor
+        self.p_dest[slot] = self.p_floors_queue[slot].pop(0)
+        self.p_state[slot] = PASSENGER_STATE['walking_on_floor']
+        self.p_reward_ready[slot] = False
+
+    def passenger_reward(self, slot):
+        self.p_reward_ready[slot] = False
+        index = self.p_elevator[slot]
+        elevator_type = self.e_type[index]
+        diff = abs(int(self.p_dest[slot]) - int(self.p_from[slot]))
+        score = 0
+        if self.p_floor[slot] == self.p_dest[slot]:
+            score = diff * settings.PASSENGERS['REWARD']
+            if elevator_type != self.p_type[slot]:
+                score *= settings.PASSENGERS['ENEMY_REWARD']
+        self.players_score[PLAYER_TYPES[elevator_type]] += score
+        self.p_type[slot] = elevator_type
@@ -0,0 +1,205 @@
+# coding=utf-8
+import importlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from core import settings
+from core.api import API
+from core.world import World
+
+
+def is_core_module(name):
+    return name == 'core' or name.startswith('core.')
+
+
+def load_client_api(client_dir, color):
+    # Клиенты, как и мир, лежат в пакете core, поэтому на время импорта
+    # подменяем его в sys.modules и возвращаем обратно после создания API.
+    # Модули клиента возвращаются вместе с API: python2 обнуляет глобальные
+    # переменные модуля, как только на него не остается ссылок
+    world_modules = {k: sys.modules.pop(k) for k in list(sys.modules) if is_core_module(k)}
+    client_modules = {}
+    sys.path.insert(0, os.path.realpath(client_dir))
+    try:
+        api_class = importlib.import_module('core.api').API
+        if hasattr(api_class, 'turn'):
+            return api_class(color), client_modules
+        return api_class(), client_modules
+    finally:
+        sys.path.pop(0)
+        for k in [k for k in sys.modules if is_core_module(k)]:
+            client_modules[k] = sys.modules.pop(k)
+        sys.modules.update(world_modules)
+
+
+class LocalClient(object):
+    max_client_time = int(os.environ.get('MAX_CLIENT_TIME', 120))
+    max_tick_time = timedelta(seconds=10)
+
+    def __init__(self, client_dir, color, solution_id=None):
+        self.solution_id = solution_id
+        self.total_time = 0
+        self.is_close = False
+        self.api, self.modules = load_client_api(client_dir, color)
+
+    def close(self):
+        self.is_close = True
+
+    def budget(self):
+        # Те же поля, что сервер добавляет в состояние для сетевых клиентов
+        return {
+            'time_left': round(max(0, self.max_client_time - self.total_time), 3),
+            'tick_timeout': self.max_tick_time.total_seconds(),
+        }
+
+    def turn(self, state):
+        message = []
+        before_turn_time = datetime.now()
+        try:
+            if hasattr(self.api, 'turn'):
+                message = self.api.turn(state)
+            else:
+                message = self.api.generate_actions(state)
+        except Exception:
+            self.is_close = True
+            message = [{
+                'command': 'fatal_error',
+                'args': {
+                    'text': u'Стратегия аварийно завершила работу'
+                }
+            }]
+            return message
+        tick_time = datetime.now() - before_turn_time
+
+        if tick_time > self.max_tick_time:
+            self.is_close = True
+            message = [{
+                'command': 'fatal_error',
+                'args': {
+                    'text': u'Время выполнения одного тика превышено'
+                }
+            }]
+            return message
+        self.total_time += tick_time.total_seconds()
+
+        if self.total_time > self.max_client_time:
+            self.close()
+
+            message.append({
+                'command': 'fatal_error',
+                'args': {
+                    'text': u'Время выполнения стратегии первышено'
+                }
+            })
+        return message
+
+
+class HeadlessMatch(object):
+    ticks_count = int(os.environ.get('TICKS_COUNT', 7200))
+    # Промотка тиков, на которых команды ничего не меняют: стратегии не вызываются
+    # на каждом тике, поэтому для стратегий, считающих тики сами, игра будет другой.
+    # Для записи лога визуализатора не используется, там нужен каждый тик
+    fast_forward = bool(os.environ.get('FAST_FORWARD'))
+    # Игра заканчивается раньше, когда счет уже не может измениться
+    early_finish = bool(os.environ.get('EARLY_FINISH'))
+
+    def __init__(self, red_client, blue_client, seed=None):
+        self.api = API(seed)
+        self.seed = self.api.world.seed
+        self.red_client = red_client
+        self.blue_client = blue_client
+        self.skipped_ticks = 0
+
+    def restore(self, path):
+        # Продолжение игры со снимка мира. Стратегии при этом начинают заново
+        self.api.world = World.load(path)
+        self.seed = self.api.world.seed
+
+    def play(self, replay=None, snapshot_path=None, snapshot_every=500):
+        self.api.create_players(self.red_client, self.blue_client)
+        fast_forward = self.fast_forward and not replay
+
+        tick = self.api.world.counter
+        snapshot_tick = tick
+        while tick < self.ticks_count:
+            blue_message = []
+            if not self.blue_client.is_close:
+                blue_message = self.blue_client.turn(self.get_state_for(self.blue_client, tick))
+
+            red_message = []
+            if not self.red_client.is_close:
+                red_message = self.red_client.turn(self.get_state_for(self.red_client, tick))
+
+            self.api.apply_commands(blue_message, self.blue_client)
+            self.api.apply_commands(red_message, self.red_client)
+            self.api.tick()
+            if replay:
+                replay.write_tick(self.api.get_visio_state())
+            else:
+                self.api.clear_client_debug()
+
+            tick += 1
+            if fast_forward:
+                skipped = self.api.fast_forward(self.ticks_count - tick)
+                self.skipped_ticks += skipped
+                tick += skipped
+            if self.early_finish and self.api.is_finished(self.ticks_count - tick):
+                break
+
+            if snapshot_path and tick - snapshot_tick >= snapshot_every and tick < self.ticks_count:
+                self.api.world.save(snapshot_path)
+                snapshot_tick = tick
+
+        # Снимок нужен только для продолжения упавшей игры: доигранная игра
+        # с него не продолжается, иначе повторный запуск вернет старый счет
+        if snapshot_path and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        return self.get_scores()
+
+    def get_state_for(self, client, tick):
+        return dict(self.api.get_world_state_for(client), tick=tick, **client.budget())
+
+    def get_scores(self):
+        building = self.api.world.building
+        return {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: building.get_score_for(settings.PLAYERS['FIRST_PLAYER_KEY']),
+            settings.PLAYERS['SECOND_PLAYER_KEY']: building.get_score_for(settings.PLAYERS['SECOND_PLAYER_KEY']),
+        }
+
+    def get_visio_config(self):
+        return dict(settings.BUILDING_VISIO, SEED=self.seed)
+
+    def get_players(self):
+        return {
+            "FIRST_PLAYER": self.red_client.solution_id,
+            "SECOND_PLAYER": self.blue_client.solution_id,
+        }
+
+
+def client_name(client_dir):
+    return os.path.basename(os.path.normpath(client_dir))
+
+
+def play_match(task):
+    seed, red_dir, blue_dir = task
+    started = time.time()
+    red_client = LocalClient(red_dir, settings.PLAYERS['FIRST_PLAYER_KEY'], solution_id=client_name(red_dir))
+    blue_client = LocalClient(blue_dir, settings.PLAYERS['SECOND_PLAYER_KEY'], solution_id=client_name(blue_dir))
+    match = HeadlessMatch(red_client, blue_client, seed=seed)
+    scores = match.play()
+    return {
+        'seed': seed,
+        'players': {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: red_dir,
+            settings.PLAYERS['SECOND_PLAYER_KEY']: blue_dir,
+        },
+        'scores': scores,
+        'wall_time': round(time.time() - started, 3),
+        'skipped_ticks': match.skipped_ticks,
+        'client_time': {
+            settings.PLAYERS['FIRST_PLAYER_KEY']: round(red_client.total_time, 3),
+            settings.PLAYERS['SECOND_PLAYER_KEY']: round(blue_client.total_time, 3),
+        }
+    }
@@ -0,0 +1,62 @@
+# coding=utf-8
+import gzip
+import json
+
+from core.codec import codec
+
+HEADER_PREFIX = 'var data = '
+FOOTER = ']};\n'
+
+
+def open_replay_file(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+class ReplayWriter(object):
+    # game.js остается валидным js для визуализатора, но пишется по мере игры:
+    # заголовок с config и players, затем каждый тик отдельной строкой
+    def __init__(self, path, config, players):
+        self.path = path
+        self.file = open_replay_file(path, 'wb')
+        self.ticks = 0
+        header = json.dumps({'config': config, 'players': players}, separators=(',', ':'))
+        self.file.write(HEADER_PREFIX)
+        self.file.write(header[:-1])
+        self.file.write(',"game_data":[\n')
+
+    def write_tick(self, state):
+        if self.ticks:
+            self.file.write(',')
+        self.file.write(codec.dumps(state))
+        self.file.write('\n')
+        self.ticks += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(FOOTER)
+        self.file.close()
+
+
+class ReplayReader(object):
+    def __init__(self, path):
+        self.path = path
+        with open_replay_file(path, 'rb') as f:
+            header = json.loads(self.read_header(f))
+        self.config = header['config']
+        self.players = header['players']
+
+    @staticmethod
+    def read_header(f):
+        header = f.readline()
+        return header[len(HEADER_PREFIX):].rstrip() + ']}'
+
+    def __iter__(self):
+        with open_replay_file(self.path, 'rb') as f:
+            self.read_header(f)
+            for line in f:
+                if line.startswith(']'):
+                    break
+                yield codec.loads(line.lstrip(','))
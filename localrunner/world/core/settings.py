@@ -1,4 +1,4 @@
-from random import randint, seed
+from random import randint
 import sys
 
 try:
@@ -6,8 +6,6 @@ try:
 except (ValueError, TypeError, IndexError):
     sd = randint(0, 10000000)
 
-seed(sd)
-
 PLAYERS = {
     "FIRST_PLAYER_KEY": "FIRST_PLAYER",
     "SECOND_PLAYER_KEY": "SECOND_PLAYER"
@@ -16,7 +14,7 @@ PLAYERS = {
 BUILDING = {
     'TICK_TO_SPAWN': 20,
     'TICK_COUNT_TO_SPAWN': 2000,
-    'FLOORS_QUEUE_LEN': lambda: randint(1, 5),
+    'FLOORS_QUEUE_LEN': lambda rng: rng.randint(1, 5),
 }
 
 BUILDING_VISIO = {
@@ -51,7 +49,7 @@ PASSENGERS = {
         'DOWN': 100,
         'UP': 200,
     },
-    'WEIGHT': lambda: randint(1010000, 1030000) / 1000000.,
+    'WEIGHT': lambda rng: rng.randint(1010000, 1030000) / 1000000.,
     'REWARD': 10,
     'ENEMY_REWARD': 2,
     'TIME_TO_AWAY': 500,
@@ -0,0 +1,95 @@
+# coding=utf-8
+import json
+import os
+import time
+
+PHASES = ('state', 'encode', 'wait', 'decode', 'apply', 'tick', 'replay')
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def distribution(values):
+    return {
+        'count': len(values),
+        'total': sum(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values) if values else None,
+    }
+
+
+def timings_path(replay_path):
+    path = replay_path
+    for ext in ('.gz', '.js'):
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+    return path + '.timings.json'
+
+
+class TickTimings(object):
+    # Время каждой фазы тика, по колонке на фазу, и задержки ответов игроков
+    enabled = True
+    now = staticmethod(time.time)
+
+    def __init__(self):
+        self.phases = {phase: [] for phase in PHASES}
+        self.latency = {}
+
+    def begin_tick(self):
+        for values in self.phases.itervalues():
+            values.append(0.)
+
+    def add(self, phase, started):
+        self.phases[phase][-1] += time.time() - started
+
+    def current(self, phase):
+        # Сколько фаза уже набрала на текущем тике
+        return self.phases[phase][-1]
+
+    def add_latency(self, player, seconds):
+        self.latency.setdefault(player, []).append(seconds)
+
+    def summary(self):
+        return {
+            'phases': {phase: distribution(values) for phase, values in self.phases.iteritems()},
+            'latency': {player: distribution(values) for player, values in self.latency.iteritems()},
+        }
+
+    def export(self, path):
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'ticks': self.phases, 'latency': self.latency}, f, separators=(',', ':'))
+
+
+class NullTimings(object):
+    enabled = False
+
+    @staticmethod
+    def now():
+        return 0
+
+    def begin_tick(self):
+        pass
+
+    def add(self, phase, started):
+        pass
+
+    @staticmethod
+    def current(phase):
+        return 0
+
+    def add_latency(self, player, seconds):
+        pass
+
+    def export(self, path):
+        pass
+
+
+def create_timings():
+    if os.environ.get('TIMINGS'):
+        return TickTimings()
+    return NullTimings()
@@ -1,10 +1,9 @@
 import math
 from itertools import chain
-from random import randint, shuffle
 from itertools import cycle
 
 
-def range_generator(min, max):
+def range_generator(min, max, rng):
     prev = 1467632017.0
     m = 2147483647.0
     k = 16807.0
@@ -14,16 +13,16 @@ def range_generator(min, max):
         prev = (k * prev + b) % m
 
         delta = int((math.floor(prev * max / m) + min) % (max + 1))
-        from_floor = randint(min, max - delta)
-        if randint(0, 1):
+        from_floor = rng.randint(min, max - delta)
+        if rng.randint(0, 1):
             yield from_floor, (from_floor + delta)
         else:
             yield (from_floor + delta), from_floor
 
 
-def group_size_generator(sizes):
+def group_size_generator(sizes, rng):
     sizes = list(chain(*[[k for _ in range(0, v)] for k, v in sizes.iteritems()]))
-    shuffle(sizes)
+    rng.shuffle(sizes)
     for i in cycle(sizes):
         yield i
 
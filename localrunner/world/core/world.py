@@ -1,54 +1,167 @@
-from itertools import groupby
+# coding=utf-8
+import cPickle
+import gzip
+import os
+from random import Random
 
 from core import settings
 from core.game_objects.building import Building
 
 
+def passenger_visio(passenger):
+    # То же, что Passenger.get_visio, из уже сериализованного пассажира
+    return {
+        "x": passenger["x"],
+        "y": passenger["y"],
+        "type": passenger["type"],
+        "state": passenger["state"],
+        "id": passenger["id"],
+        "time_to_away": passenger["time_to_away"],
+    }
+
+
 class World(object):
-    def __init__(self):
-        self.building = Building()
+    backend = os.environ.get('WORLD_BACKEND', 'python')
+    serialized = None
+
+    def __init__(self, seed=None, backend=None):
+        self.seed = settings.BUILDING['SEED'] if seed is None else seed
+        self.rng = Random(self.seed)
+        if backend is not None:
+            self.backend = backend
+        if self.backend == 'numpy':
+            from core.game_objects.vector_building import VectorBuilding
+            self.building = VectorBuilding(self.rng)
+        else:
+            self.building = Building(self.rng)
+        red = self.building.get_player_elevator(settings.PLAYERS['FIRST_PLAYER_KEY'])
+        blue = self.building.get_player_elevator(settings.PLAYERS['SECOND_PLAYER_KEY'])
+        self.visio_elevators = list(reversed(red)) + blue
         self.counter = 0
+        self.serialized = None
         self.next_spawn = settings.BUILDING['TICK_TO_SPAWN']
         self.building.spawn()
 
     def tick(self):
+        self.serialized = None
         self.counter += 1
         self.building.on_tick()
         if self.counter < settings.BUILDING['TICK_COUNT_TO_SPAWN'] and self.counter % self.next_spawn == 0:
             self.next_spawn = settings.BUILDING['TICK_TO_SPAWN']
             self.building.spawn()
 
+    def __getstate__(self):
+        # Кеш сериализации в снимок не попадает
+        state = self.__dict__.copy()
+        state.pop('serialized', None)
+        return state
+
+    def is_finished(self, ticks_left=None):
+        # Новых пассажиров больше не будет, а оставшиеся уже не успеют (или не смогут)
+        # доехать до своего этажа: до конца игры счет не изменится
+        if self.counter + 1 < settings.BUILDING['TICK_COUNT_TO_SPAWN']:
+            return False
+        return not self.building.can_score(ticks_left)
+
+    def snapshot(self):
+        # Полное состояние мира: здание с таймерами лифтов и очередями этажей
+        # пассажиров, состояние rng, counter и next_spawn
+        return cPickle.dumps(self, cPickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def restore(data):
+        world = cPickle.loads(data)
+        if world.building.floors_count != settings.BUILDING['FLOORS_COUNT']:
+            raise ValueError('snapshot was made for {} floors, settings have {}'.format(
+                world.building.floors_count, settings.BUILDING['FLOORS_COUNT']))
+        return world
+
+    def clone(self):
+        return cPickle.loads(self.snapshot())
+
+    def save(self, path):
+        # Сначала во временный файл: снимок на диске всегда целый, даже если
+        # процесс упал во время записи
+        temp_path = path + '.tmp'
+        open_file = gzip.open if path.endswith('.gz') else open
+        with open_file(temp_path, 'wb') as f:
+            f.write(self.snapshot())
+        os.rename(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        open_file = gzip.open if path.endswith('.gz') else open
+        with open_file(path, 'rb') as f:
+            return World.restore(f.read())
+
+    def fast_forward(self, limit):
+        # Проматывает до limit тиков, на которых только идут таймеры, разом.
+        # Останавливается перед появлением новых пассажиров и перед тиком, на котором
+        # кто-то меняет состояние или команда игрока может что-то изменить.
+        # Возвращает число промотанных тиков
+        next_spawn = (self.counter // self.next_spawn + 1) * self.next_spawn
+        if next_spawn < settings.BUILDING['TICK_COUNT_TO_SPAWN']:
+            limit = min(limit, next_spawn - self.counter - 1)
+        if limit <= 0:
+            return 0
+        ticks = self.building.idle_ticks(limit)
+        if ticks:
+            self.serialized = None
+            self.building.skip(ticks)
+            self.counter += ticks
+        return ticks
+
     def get_elevator_for(self, player):
         return self.building.players_elevators[player]
 
+    def invalidate(self):
+        self.serialized = None
+
+    def get_serialized(self):
+        # Каждый лифт и каждый видимый пассажир сериализуются один раз за тик:
+        # одни и те же словари уходят в состояния обоих игроков, в лифты
+        # и в кадр визуализатора, поэтому менять их нельзя. Кеш сбрасывается
+        # в tick(), при промотке и при командах игроков
+        if self.serialized is None:
+            elevators = {}
+            passengers = {}
+            passengers_by_id = {}
+            for player in settings.PLAYERS.itervalues():
+                visible = self.building.serialize_visible_passengers(player)
+                for passenger in visible:
+                    passengers_by_id[passenger['id']] = passenger
+                passengers[player] = visible
+            for player in settings.PLAYERS.itervalues():
+                elevators[player] = self.building.serialize_elevators(player, passengers_by_id)
+            self.serialized = elevators, passengers, passengers_by_id
+        return self.serialized
+
     def get_state_for(self, player):
-        if player == settings.PLAYERS['FIRST_PLAYER_KEY']:
-            return {
-                "my_elevators": [e.serialize() for e in self.get_red_elevators()],
-                "enemy_elevators": [e.serialize() for e in self.get_blue_elevators()],
-                "my_passengers": [p.serialize() for p in self.get_red_passengers() if not p.is_walking_on_floor()],
-                "enemy_passengers": [p.serialize() for p in self.get_blue_passengers() if not p.is_walking_on_floor()],
-            }
+        red = settings.PLAYERS['FIRST_PLAYER_KEY']
+        blue = settings.PLAYERS['SECOND_PLAYER_KEY']
+        me, enemy = (red, blue) if player == red else (blue, red)
+        elevators, passengers, _ = self.get_serialized()
         return {
-            "my_elevators": [e.serialize() for e in self.get_blue_elevators()],
-            "enemy_elevators": [e.serialize() for e in self.get_red_elevators()],
-            "my_passengers": [p.serialize() for p in self.get_blue_passengers() if not p.is_walking_on_floor()],
-            "enemy_passengers": [p.serialize() for p in self.get_red_passengers() if not p.is_walking_on_floor()],
+            "my_elevators": elevators[me],
+            "enemy_elevators": elevators[enemy],
+            "my_passengers": passengers[me],
+            "enemy_passengers": passengers[enemy],
         }
 
     def get_visio_state(self):
         red = settings.PLAYERS["FIRST_PLAYER_KEY"]
         blue = settings.PLAYERS["SECOND_PLAYER_KEY"]
+        _, _, passengers_by_id = self.get_serialized()
         return {
-            "elevators": [e.get_visio() for e in list(reversed(self.get_red_elevators())) + self.get_blue_elevators()],
-            "passengers": [p.get_visio() for p in self.get_passengers() if not p.is_walking_on_floor()],
+            "elevators": [e.get_visio() for e in self.visio_elevators],
+            "passengers": [passenger_visio(passengers_by_id[p.id]) for p in self.get_passengers() if p.id in passengers_by_id],
             "scores": {
                 red: self.building.get_score_for(red),
                 blue: self.building.get_score_for(blue)
             },
             "waiting_passengers": {
-                red: {f: len(list(c)) for f, c in groupby(sorted(filter(lambda p: p.is_walking_on_floor(), self.get_red_passengers()), key=lambda p: p.floor), lambda p: p.floor)},
-                blue: {f: len(list(c)) for f, c in groupby(sorted(filter(lambda p: p.is_walking_on_floor(), self.get_blue_passengers()), key=lambda p: p.floor), lambda p: p.floor)}
+                red: self.building.get_waiting_passengers(red),
+                blue: self.building.get_waiting_passengers(blue)
             }
         }
 
@@ -59,21 +172,22 @@ class World(object):
         return self.building.get_player_elevator(settings.PLAYERS['SECOND_PLAYER_KEY'])
 
     def get_red_passengers(self):
-        return filter(lambda p: p.get_type() == settings.PLAYERS['FIRST_PLAYER_KEY'], self.get_passengers())
+        return self.building.get_player_passengers(settings.PLAYERS['FIRST_PLAYER_KEY'])
 
     def get_blue_passengers(self):
-        return filter(lambda p: p.get_type() == settings.PLAYERS['SECOND_PLAYER_KEY'], self.get_passengers())
+        return self.building.get_player_passengers(settings.PLAYERS['SECOND_PLAYER_KEY'])
 
     def get_passengers(self):
-        return self.building.all_passengers
+        return self.building.get_passengers()
 
     def get_state(self):
         red = settings.PLAYERS["FIRST_PLAYER_KEY"]
         blue = settings.PLAYERS["SECOND_PLAYER_KEY"]
+        elevators, _, passengers_by_id = self.get_serialized()
         return {
-            red + "_elevators": [e.serialize() for e in self.get_red_elevators()],
-            blue + "_elevators": [e.serialize() for e in self.get_blue_elevators()],
-            "passengers": [p.serialize() for p in self.get_passengers() if not p.is_walking_on_floor()],
+            red + "_elevators": elevators[red],
+            blue + "_elevators": elevators[blue],
+            "passengers": [passengers_by_id[p.id] for p in self.get_passengers() if p.id in passengers_by_id],
             red + "_score": self.building.get_score_for(red),
             blue + "_score": self.building.get_score_for(blue)
         }
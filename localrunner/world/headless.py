@@ -0,0 +1,72 @@
+# coding=utf-8
+import json
+import os
+import sys
+
+from core.command_log import CommandLogWriter
+from core.headless import HeadlessMatch, LocalClient, client_name
+from core.replay import ReplayWriter
+
+# python headless.py <seed> <red_client_dir> <blue_client_dir> [game.js|game.js.gz]
+# seed читается в core/settings.py из sys.argv[1], как и у run.py.
+# С SNAPSHOT_PATH снимок мира сохраняется каждые SNAPSHOT_EVERY тиков
+# в файл с seed в имени, а если снимок уже есть, игра продолжается с него.
+# С COMMAND_LOG команды игроков пишутся в журнал для resimulate.py
+
+
+def seed_path(path, seed):
+    # world.pkl.gz -> world.7.pkl.gz: снимки игр с разными seed не подменяют друг друга
+    directory, name = os.path.split(path)
+    parts = name.split('.', 1)
+    parts.insert(1, str(seed))
+    return os.path.join(directory, '.'.join(parts))
+
+
+def main(argv):
+    if len(argv) < 4:
+        print 'usage: python headless.py <seed> <red_client_dir> <blue_client_dir> [game.js|game.js.gz]'
+        return 1
+
+    red_client = LocalClient(argv[2], 'FIRST_PLAYER', solution_id=client_name(argv[2]))
+    blue_client = LocalClient(argv[3], 'SECOND_PLAYER', solution_id=client_name(argv[3]))
+    match = HeadlessMatch(red_client, blue_client)
+    snapshot_path = os.environ.get('SNAPSHOT_PATH')
+    if snapshot_path:
+        snapshot_path = seed_path(snapshot_path, match.seed)
+    command_log = None
+    if snapshot_path and os.path.exists(snapshot_path):
+        seed = match.seed
+        match.restore(snapshot_path)
+        if match.seed != seed:
+            print >> sys.stderr, 'snapshot {} has seed {}, not {}'.format(snapshot_path, match.seed, seed)
+            return 1
+        print >> sys.stderr, 'resuming from snapshot {} at tick {}'.format(snapshot_path, match.api.world.counter)
+        if os.environ.get('COMMAND_LOG'):
+            print >> sys.stderr, 'COMMAND_LOG is not written for a game resumed from a snapshot'
+    elif os.environ.get('COMMAND_LOG'):
+        # Журнал пишется только для игры с первого тика, иначе его не с чего повторить
+        command_log = CommandLogWriter(os.environ['COMMAND_LOG'], match.seed)
+        match.api.command_log = command_log
+    replay = None
+    if len(argv) > 4:
+        replay = ReplayWriter(argv[4], match.get_visio_config(), match.get_players())
+    scores = match.play(replay=replay, snapshot_path=snapshot_path,
+                        snapshot_every=int(os.environ.get('SNAPSHOT_EVERY', 500)))
+    if replay:
+        replay.close()
+    if command_log:
+        command_log.close(match.api.world.counter, scores)
+
+    print json.dumps({
+        'seed': match.seed,
+        'scores': scores,
+        'total_time': {
+            'FIRST_PLAYER': red_client.total_time,
+            'SECOND_PLAYER': blue_client.total_time,
+        }
+    })
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,62 @@
+# coding=utf-8
+import argparse
+import json
+import sys
+import time
+
+from benchmark import BLUE, RED, configure
+from core.api import API
+from core.command_log import CommandLogReader
+
+
+def advance(api, tick, fast_forward):
+    # Между записанными командами игроки ничего не меняли, такие тики
+    # можно проматывать: результат тот же, что и при обычных тиках
+    while api.world.counter < tick:
+        if fast_forward and api.fast_forward(tick - api.world.counter):
+            continue
+        api.tick()
+
+
+def resimulate(path, backend=None, fast_forward=False):
+    log = CommandLogReader(path)
+    configure(log.config['FLOORS_COUNT'], log.config['ELEVATORS_FOR_PASSENGER_COUNT'])
+
+    started = time.time()
+    api = API(log.seed, backend=backend)
+    api.create_players(RED, BLUE)
+    for tick, player, commands in log.entries:
+        advance(api, tick, fast_forward)
+        api.apply_commands(commands, player)
+    if log.ticks is not None:
+        advance(api, log.ticks, fast_forward)
+
+    scores = {RED: api.world.building.get_score_for(RED), BLUE: api.world.building.get_score_for(BLUE)}
+    return {
+        'log': path,
+        'seed': log.seed,
+        'ticks': api.world.counter,
+        'expected': log.scores,
+        'scores': scores,
+        'ok': log.scores is not None and scores == log.scores,
+        'time': round(time.time() - started, 3),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Повторный прогон мира по журналам команд')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--backend')
+    parser.add_argument('--fast-forward', action='store_true')
+    args = parser.parse_args(argv[1:])
+
+    failed = False
+    for path in args.logs:
+        result = resimulate(path, args.backend, args.fast_forward)
+        print json.dumps(result, sort_keys=True)
+        failed = failed or not result['ok']
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
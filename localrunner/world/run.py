@@ -1,8 +1,11 @@
 # coding=utf-8
 import json
 import os
+import sys
+import time
 
 from datetime import datetime, timedelta
+from random import randint
 import requests
 from cStringIO import StringIO
 
@@ -10,6 +13,14 @@ from tornado.iostream import StreamClosedError
 
 from core import settings
 from core.api import API
+from core.codec import codec
+from core.command_log import CommandLogWriter
+from core.delta import DeltaEncoder
+from core.framing import HEADER, create_framing
+from core.replay import ReplayWriter
+from core.timings import NullTimings, create_timings, timings_path
+from tornado.netutil import bind_sockets
+from tornado.process import fork_processes
 from tornado.tcpserver import TCPServer
 import tornado.gen
 import tornado.ioloop
@@ -19,38 +30,103 @@ import gzip
 
 class Client(object):
     max_client_time = int(os.environ.get('MAX_CLIENT_TIME', 120))
+    tick_timeout = 10
 
     def __init__(self, stream):
         self.solution_id = None
+        self.protocol = None
+        self.encoder = None
+        self.format = None
+        self.framing = None
         self.stream = stream
         self.total_time = 0
         self.is_close = False
+        self.timings = NullTimings()
+        self.player = None
 
     def set_solution_id(self, solution_id):
         self.solution_id = solution_id
 
+    def set_protocol(self, protocol):
+        if protocol == 'delta':
+            self.protocol = protocol
+            self.encoder = DeltaEncoder()
+
+    def set_format(self, format):
+        if create_framing(format):
+            self.format = format
+
+    def set_timings(self, timings, player):
+        self.timings = timings
+        self.player = player
+
     def send(self, message):
         self.stream.write(self.dump_message(message))
 
+    def budget(self):
+        # Сколько времени осталось стратегии, в секундах: всего и на один тик
+        return {
+            'time_left': round(max(0, self.max_client_time - self.total_time), 3),
+            'tick_timeout': self.tick_timeout,
+        }
+
+    def send_state(self, state):
+        started = self.timings.now()
+        if self.encoder:
+            state = self.encoder.encode(state)
+        message = self.dump_message(state)
+        self.timings.add('encode', started)
+        self.stream.write(message)
+
+    def beginning_message(self, color):
+        message = {'message': 'beginning', 'color': color}
+        if self.protocol:
+            message['protocol'] = self.protocol
+        if self.format:
+            message['format'] = self.format
+        return message
+
+    def send_beginning(self, color):
+        # Приветствие всегда уходит строкой json, бинарные кадры начинаются после него
+        self.send(self.beginning_message(color))
+        if self.format:
+            self.framing = create_framing(self.format)
+
     def close(self):
         self.is_close = True
         self.stream.close()
 
-    @staticmethod
-    def dump_message(message):
-        message = '{}\n'.format(json.dumps(message, separators=(',', ':')).encode('string-escape'))
-        return message
+    def dump_message(self, message):
+        if self.framing:
+            return self.framing.dump(message)
+        return '{}\n'.format(codec.dumps(message))
+
+    def load_message(self, data):
+        if self.framing:
+            return self.framing.load(data)
+        return codec.loads(data)
+
+    @tornado.gen.coroutine
+    def read_frame(self):
+        if self.framing:
+            header = yield self.stream.read_bytes(HEADER.size)
+            body = yield self.stream.read_bytes(HEADER.unpack(header)[0])
+            raise tornado.gen.Return(body)
+        line = yield self.stream.read_until('\n')
+        raise tornado.gen.Return(line.strip())
 
     @tornado.gen.coroutine
     def read_messages(self):
         message = []
         try:
             before_read_time = datetime.now()
-            message = yield tornado.gen.with_timeout(timedelta(seconds=10), self.stream.read_until('\n'))
+            message = yield tornado.gen.with_timeout(timedelta(seconds=self.tick_timeout), self.read_frame())
             tick_time = datetime.now() - before_read_time
-            message = message.strip()
+            self.timings.add_latency(self.player, tick_time.total_seconds())
+            started = self.timings.now()
             try:
-                message = json.loads(message, strict=False)
+                message = self.load_message(message)
+                self.timings.add('decode', started)
             except ValueError as e:
                 message = [{
                         'command': 'fatal_error',
@@ -89,94 +165,210 @@ class Client(object):
         raise tornado.gen.Return(message)
 
 
-class WorldHandler(object):
-    api = API()
-    red_client = None
-    blue_client = None
+class MatchSession(object):
+    # Одна игра пары клиентов со своим API и миром. Игры разных сессий идут
+    # на одном IOLoop независимо: пока одна ждет ответов своих клиентов,
+    # остальные продолжают считать тики
     ticks_count = int(os.environ.get('TICKS_COUNT', 7200))
-    result = []
+    # Игра заканчивается раньше, когда счет уже не может измениться
+    early_finish = bool(os.environ.get('EARLY_FINISH'))
+
+    def __init__(self, session_id, red_client, blue_client, seed=None, replay_path=None, command_log_path=None,
+                 timings_path=None):
+        self.session_id = session_id
+        self.api = API(seed)
+        self.red_client = red_client
+        self.blue_client = blue_client
+        self.replay_path = replay_path
+        self.command_log_path = command_log_path
+        self.timings_path = timings_path
+
+    def shutdown(self):
+        for client in (self.blue_client, self.red_client):
+            if not client.is_close:
+                client.send({'message': 'down'})
+                client.close()
+
+    def result(self, started):
+        return {
+            'session': self.session_id,
+            'seed': self.api.world.seed,
+            'ticks': self.api.world.counter,
+            'players': {
+                'FIRST_PLAYER': self.red_client.solution_id,
+                'SECOND_PLAYER': self.blue_client.solution_id,
+            },
+            'scores': {
+                'FIRST_PLAYER': self.api.world.building.get_score_for('FIRST_PLAYER'),
+                'SECOND_PLAYER': self.api.world.building.get_score_for('SECOND_PLAYER'),
+            },
+            'wall_time': round(time.time() - started, 3),
+        }
+
+    @tornado.gen.coroutine
+    def play(self):
+        game_started = time.time()
+        self.api.create_players(self.red_client, self.blue_client)
+        self.red_client.send_beginning('FIRST_PLAYER')
+        self.blue_client.send_beginning('SECOND_PLAYER')
+        replay = None
+        if self.replay_path:
+            replay = ReplayWriter(self.replay_path, dict(settings.BUILDING_VISIO, SEED=self.api.world.seed), {
+                "FIRST_PLAYER": self.red_client.solution_id,
+                "SECOND_PLAYER": self.blue_client.solution_id,
+            })
+        if self.command_log_path:
+            self.api.command_log = CommandLogWriter(self.command_log_path, self.api.world.seed)
+        timings = create_timings()
+        self.red_client.set_timings(timings, 'FIRST_PLAYER')
+        self.blue_client.set_timings(timings, 'SECOND_PLAYER')
+
+        for _ in range(0, self.ticks_count):
+            timings.begin_tick()
+            started = timings.now()
+            # Оба клиента получают состояние одновременно и думают параллельно,
+            # время каждого считается в его read_messages от отправки до ответа.
+            # Команды по-прежнему применяются в порядке blue, red
+            clients = [c for c in (self.blue_client, self.red_client) if not c.is_close]
+            tick = self.api.world.counter
+            states = [(c, dict(self.api.get_world_state_for(c), tick=tick, **c.budget())) for c in clients]
+            timings.add('state', started)
+            for client, state in states:
+                client.send_state(state)
+            started = timings.now()
+            decoded = timings.current('decode')
+            messages = yield {c: c.read_messages() for c in clients}
+            # Разбор ответов идет внутри read_messages и пишется в decode,
+            # в wait остается только ожидание сокетов
+            timings.add('wait', started + timings.current('decode') - decoded)
+
+            started = timings.now()
+            self.api.apply_commands(messages.get(self.blue_client, []), self.blue_client)
+            self.api.apply_commands(messages.get(self.red_client, []), self.red_client)
+            timings.add('apply', started)
+            started = timings.now()
+            self.api.tick()
+            timings.add('tick', started)
+            if replay:
+                started = timings.now()
+                replay.write_tick(self.api.get_visio_state())
+                timings.add('replay', started)
+            if self.early_finish and self.api.is_finished(self.ticks_count - self.api.world.counter):
+                break
+
+        result = self.result(game_started)
+        try:
+            if replay:
+                replay.close()
+            if self.timings_path:
+                timings.export(self.timings_path)
+            if self.api.command_log:
+                self.api.command_log.close(result['ticks'], result['scores'])
+        except Exception as e:
+            print e
+
+        self.shutdown()
+        raise tornado.gen.Return(result)
+
 
-    client_player = {}
+class WorldHandler(object):
+    # Ждет подключений и по мере прихода собирает клиентов в пары, каждая пара
+    # играет в своей MatchSession. После matches сыгранных игр (0 - без ограничения)
+    # сервер останавливается. При workers != 1 таких обработчиков несколько,
+    # по одному на процесс, и пары собираются внутри процесса
+    replay_path = os.environ.get('REPLAY_PATH', '{}/../visualizer/game.js'.format(os.path.dirname(os.path.realpath(__file__))))
+    command_log_path = os.environ.get('COMMAND_LOG')
+    timings_path = os.environ.get('TIMINGS_PATH')
+    results_path = os.environ.get('RESULTS_PATH')
+
+    def __init__(self, matches=1, workers=1):
+        self.matches = matches
+        self.workers = workers
+        self.waiting = []
+        self.started = 0
+        self.finished = 0
+
+    def is_single_game(self):
+        # Одна игра на весь сервер: одна игра в одном процессе
+        return self.matches == 1 and self.workers == 1
+
+    def session_path(self, path, session_id):
+        # В режиме нескольких игр файл пишется, только если в пути есть {session},
+        # иначе одновременные игры писали бы в один файл
+        if not path:
+            return None
+        if self.is_single_game():
+            return path
+        if '{session}' in path:
+            return path.format(session=session_id)
+        return None
 
     @tornado.gen.coroutine
     def connect(self, stream, address):
         current_client = Client(stream)
+        protocol = None
+        format = None
         try:
             messages = yield current_client.read_messages()
+            protocol = messages.get('protocol')
+            format = messages.get('format')
             solution_id = int(messages.get('solution_id'))
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, AttributeError):
             solution_id = None
         except StreamClosedError:
             solution_id = None
         current_client.set_solution_id(solution_id)
-
-        if self.red_client is None:
-            self.red_client = current_client
-        elif self.blue_client is None:
-            self.blue_client = current_client
-            self.start()
-        else:
-            pass
-
-    def shutdown(self):
-        if not self.blue_client.is_close:
-            self.blue_client.send({'message': 'down'})
-            self.blue_client.close()
-
-        if not self.red_client.is_close:
-            self.red_client.send({'message': 'down'})
-            self.red_client.close()
-
-        tornado.ioloop.IOLoop.instance().stop()
-
-    @staticmethod
-    def write_result(data):
-        f = open('{}/../visualizer/game.js'.format(os.path.dirname(os.path.realpath(__file__))), 'w')
-        f.write("var data = ")
-        f.write(json.dumps(data, indent=4))
-        f.write(";")
-        f.close()
+        current_client.set_protocol(protocol)
+        current_client.set_format(format)
+
+        if self.matches and self.started >= self.matches:
+            current_client.close()
+            return
+        # Клиенты, отвалившиеся, пока ждали пару, в игру не попадают
+        self.waiting = [c for c in self.waiting if not c.is_close and not c.stream.closed()]
+        self.waiting.append(current_client)
+        if len(self.waiting) >= 2:
+            red_client, blue_client = self.waiting[:2]
+            self.waiting = self.waiting[2:]
+            self.start(red_client, blue_client)
 
     @tornado.gen.coroutine
-    def start(self):
-        self.api.create_players(self.red_client, self.blue_client)
-        self.red_client.send({'message': 'beginning', 'color': 'FIRST_PLAYER'})
-        self.blue_client.send({'message': 'beginning', 'color': 'SECOND_PLAYER'})
-
-        for _ in range(0, self.ticks_count):
-            blue_message = []
-            if not self.blue_client.is_close:
-                self.blue_client.send(self.api.get_world_state_for(self.blue_client))
-                blue_message = yield self.blue_client.read_messages()
-
-            red_message = []
-            if not self.red_client.is_close:
-                self.red_client.send(self.api.get_world_state_for(self.red_client))
-                red_message = yield self.red_client.read_messages()
-
-            self.api.apply_commands(blue_message, self.blue_client)
-            self.api.apply_commands(red_message, self.red_client)
-            self.api.tick()
-            self.result.append(self.api.get_visio_state())
-
+    def start(self, red_client, blue_client):
+        self.started += 1
+        session_id = '{}-{}'.format(os.getpid(), self.started)
+        # Единственная игра идет на seed из аргументов, как и раньше,
+        # в режиме нескольких игр у каждой свой
+        seed = None if self.is_single_game() else randint(0, 10000000)
+        replay_path = self.session_path(self.replay_path, session_id)
+        # Без TIMINGS_PATH замеры лежат рядом с логом визуализатора
+        session_timings_path = self.session_path(self.timings_path, session_id)
+        if not self.timings_path and replay_path:
+            session_timings_path = timings_path(replay_path)
+        session = MatchSession(session_id, red_client, blue_client, seed, replay_path,
+                               self.session_path(self.command_log_path, session_id), session_timings_path)
         try:
-            self.write_result({
-                'config': settings.BUILDING_VISIO,
-                'game_data': self.result,
-                'players': {
-                    "FIRST_PLAYER": self.red_client.solution_id,
-                    "SECOND_PLAYER": self.blue_client.solution_id,
-                }
-            })
+            result = yield session.play()
+            self.write_result(result)
         except Exception as e:
             print e
+            session.shutdown()
 
-        self.shutdown()
+        self.finished += 1
+        if self.matches and self.finished >= self.matches:
+            tornado.ioloop.IOLoop.current().stop()
+
+    def write_result(self, result):
+        line = json.dumps(result, sort_keys=True)
+        print line
+        sys.stdout.flush()
+        if self.results_path:
+            with open(self.results_path, 'a') as f:
+                f.write(line + '\n')
 
 
 class Server(TCPServer):
-    def __init__(self):
-        self.world_handler = WorldHandler()
+    def __init__(self, matches=1, workers=1):
+        self.world_handler = WorldHandler(matches, workers)
         super(Server, self).__init__()
 
     @tornado.gen.coroutine
@@ -184,5 +376,22 @@ class Server(TCPServer):
         self.world_handler.connect(stream, address)
 
 
-server = Server().listen(8000)
-tornado.ioloop.IOLoop.instance().start()
+def main():
+    port = int(os.environ.get('PORT', 8000))
+    matches = int(os.environ.get('MATCHES', 1))
+    workers = int(os.environ.get('WORKERS', 1))
+    if workers != 1 and matches == 1:
+        print >> sys.stderr, ('WORKERS={} with MATCHES=1: every worker waits for its own pair of clients, '
+                              'clients of one pair may get into different workers and wait forever'.format(workers))
+    sockets = bind_sockets(port)
+    if workers != 1:
+        # Сокет общий, ядро раздает подключения по процессам, и пары собираются
+        # внутри каждого процесса. 0 - по процессу на ядро
+        fork_processes(workers)
+    server = Server(matches, workers)
+    server.add_sockets(sockets)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == '__main__':
+    main()
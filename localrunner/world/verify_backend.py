@@ -0,0 +1,83 @@
+# coding=utf-8
+import argparse
+import json
+import sys
+
+from benchmark import BLUE, RED, STRATEGIES, configure, int_list
+from core import settings
+from core.api import API
+
+
+def dump(state):
+    return json.dumps(state, sort_keys=True)
+
+
+def verify(backend, seed, ticks, strategy, fast_forward=False):
+    # Оба движка получают одни и те же команды, сравниваются состояния
+    # для обоих игроков и кадр визуализатора на каждом тике.
+    # С fast_forward проверяемый движок проматывает тики, а сравнение идет
+    # на тех тиках, где он снова останавливается
+    reference = API(seed, backend='python')
+    candidate = API(seed, backend=backend)
+    for api in (reference, candidate):
+        api.create_players(RED, BLUE)
+
+    skipped = 0
+    for tick in range(ticks):
+        states = {}
+        for player in (BLUE, RED):
+            expected = reference.get_world_state_for(player)
+            if not skipped and dump(expected) != dump(candidate.get_world_state_for(player)):
+                return tick, 'state for {}'.format(player)
+            states[player] = expected
+
+        for player in (BLUE, RED):
+            commands = strategy(states[player], tick)
+            reference.apply_commands(commands, player)
+            if not skipped:
+                candidate.apply_commands(commands, player)
+        reference.tick()
+        if skipped:
+            skipped -= 1
+        else:
+            candidate.tick()
+            if fast_forward:
+                skipped = candidate.fast_forward(ticks - tick - 1)
+
+        if not skipped and dump(reference.get_visio_state()) != dump(candidate.get_visio_state()):
+            return tick, 'visio state'
+    return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=u'Потиковая сверка движка с эталонным Building')
+    parser.add_argument('--backend', default='numpy')
+    parser.add_argument('--ticks', type=int, default=7200)
+    parser.add_argument('--floors', type=int_list, default=[9])
+    parser.add_argument('--elevators', type=int_list, default=[4])
+    parser.add_argument('--spawn-every', type=int, help=u'раз во сколько тиков появляются пассажиры')
+    parser.add_argument('--strategies', default='idle,baseline,flood')
+    parser.add_argument('--seeds', type=int_list, default=[1])
+    parser.add_argument('--fast-forward', action='store_true', help=u'сверять режим промотки тиков')
+    args = parser.parse_args(argv[1:])
+
+    failed = False
+    for floors in args.floors:
+        for elevators in args.elevators:
+            configure(floors, elevators, args.spawn_every)
+            for name in args.strategies.split(','):
+                for seed in args.seeds:
+                    mismatch = verify(args.backend, seed, args.ticks, STRATEGIES[name], args.fast_forward)
+                    print json.dumps({
+                        'backend': args.backend, 'floors': floors, 'elevators': elevators,
+                        'spawn_every': args.spawn_every or settings.BUILDING['TICK_TO_SPAWN'],
+                        'strategy': name, 'seed': seed, 'ticks': args.ticks, 'fast_forward': args.fast_forward,
+                        'ok': mismatch is None,
+                        'mismatch': mismatch and {'tick': mismatch[0], 'what': mismatch[1]},
+                    }, sort_keys=True)
+                    failed = failed or mismatch is not None
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))